@@ -0,0 +1,305 @@
+"""
+On-disk blob store for Edumate Backend
+Content-addressed cache for documents and images downloaded from the ERP.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Dict, Any, NamedTuple, Tuple
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BlobMeta(NamedTuple):
+    """Metadata for a stored blob; sha256 doubles as the strong ETag."""
+    sha256: str
+    size: int
+    content_type: str
+    expires_at: Optional[float]  # None means the blob never goes stale
+
+
+class BlobStore:
+    """
+    Size-bounded, content-addressed blob store on local disk.
+
+    Layout under root:
+        objects/<sha256>        blob bytes, shared by every key with that content
+        refs/<sha256(key)>.json key -> BlobMeta
+
+    Objects are evicted least-recently-used once their total size exceeds
+    max_bytes. A ref whose object was evicted is treated as a miss. Files are
+    served straight from disk, so hits never hold the body in memory.
+
+    Several workers can share one root. Each keeps its own index, but a hit
+    bumps the object's mtime and the index is rebuilt from disk (in mtime
+    order) at most every rescan_interval seconds when storing, so objects
+    written by other workers are counted against max_bytes and evicted in
+    least-recently-used order across all of them.
+
+    Refs are small but one is written per key, so every prune_interval seconds
+    a store also removes refs that have expired or whose object is gone.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024, rescan_interval: float = 30.0,
+                 prune_interval: float = 600.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self.prune_interval = prune_interval
+        self._objects_dir = os.path.join(root, "objects")
+        self._refs_dir = os.path.join(root, "refs")
+        os.makedirs(self._objects_dir, exist_ok=True)
+        os.makedirs(self._refs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._objects: "OrderedDict[str, int]" = OrderedDict()  # sha256 -> size, LRU order
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pruned_refs = 0
+        self._last_scan = 0.0
+        with self._lock:
+            self._scan()
+            self._evict()
+        self.prune_refs()
+
+    def prune_refs(self) -> int:
+        """Remove refs past their expires_at or pointing at a missing object. Returns how many."""
+        self._last_prune = time.monotonic()
+        now = time.time()
+        pruned = 0
+        for name in os.listdir(self._refs_dir):
+            if name.startswith(".tmp-"):
+                continue
+            ref_path = os.path.join(self._refs_dir, name)
+            try:
+                with open(ref_path) as f:
+                    meta = BlobMeta(**json.load(f))
+                # An object is always written before the refs pointing at it
+                stale = (meta.expires_at is not None and meta.expires_at <= now) or \
+                    not os.path.exists(self.object_path(meta.sha256))
+            except FileNotFoundError:
+                continue  # removed by another worker meanwhile
+            except (OSError, ValueError, TypeError):
+                stale = True
+            if stale:
+                self._remove_ref(ref_path)
+                pruned += 1
+        self.pruned_refs += pruned
+        return pruned
+
+    def _scan(self):
+        """
+        Rebuild the index from the objects on disk, least recently used first.
+        Picks up objects stored by other workers and forgets ones they evicted.
+        Caller holds the lock.
+        """
+        entries = []
+        for name in os.listdir(self._objects_dir):
+            if name.startswith(".tmp-"):
+                continue  # a write still in progress
+            try:
+                st = os.stat(os.path.join(self._objects_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        self._objects = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._total = sum(self._objects.values())
+        self._last_scan = time.monotonic()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return "\x1f".join(str(p) for p in parts)
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self._objects_dir, sha256)
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self._refs_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def lookup(self, key: str) -> Optional[Tuple[str, BlobMeta]]:
+        """
+        Find a stored blob.
+
+        Returns:
+            (file path, metadata) on hit, None on miss
+        """
+        ref_path = self._ref_path(key)
+        try:
+            with open(ref_path) as f:
+                meta = BlobMeta(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            self.misses += 1
+            return None
+
+        if meta.expires_at is not None and meta.expires_at <= time.time():
+            self._remove_ref(ref_path)
+            self.misses += 1
+            return None
+
+        path = self.object_path(meta.sha256)
+        try:
+            # Touching the object records the access for every worker's LRU order
+            os.utime(path)
+        except OSError:
+            # Evicted, possibly by another worker
+            self.misses += 1
+            self._remove_ref(ref_path)
+            with self._lock:
+                size = self._objects.pop(meta.sha256, None)
+                if size is not None:
+                    self._total -= size
+            return None
+        with self._lock:
+            if meta.sha256 not in self._objects:
+                # Stored by another worker since the last scan
+                self._objects[meta.sha256] = meta.size
+                self._total += meta.size
+            self._objects.move_to_end(meta.sha256)
+        self.hits += 1
+        return path, meta
+
+    def put(self, key: str, data: bytes, content_type: str, ttl: Optional[float] = None) -> Optional[BlobMeta]:
+        """
+        Store data under key and return its metadata. Like BlobWriter, a blob
+        larger than max_bytes is not stored (None): it would evict everything else.
+        """
+        if len(data) > self.max_bytes:
+            return None
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            fd, tmp_path = tempfile.mkstemp(dir=self._objects_dir, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return self._commit(key, sha256, len(data), content_type, ttl)
+
+    def writer(self, key: str, content_type: str, ttl: Optional[float] = None) -> "BlobWriter":
+        """Start storing a blob whose bytes arrive in chunks; see BlobWriter."""
+        return BlobWriter(self, key, content_type, ttl)
+
+    def _commit(self, key: str, sha256: str, size: int, content_type: str,
+                ttl: Optional[float]) -> BlobMeta:
+        meta = BlobMeta(sha256, size, content_type, time.time() + ttl if ttl is not None else None)
+        try:
+            os.utime(self.object_path(sha256))  # content stored before counts as just used
+        except OSError:
+            pass
+        with self._lock:
+            if time.monotonic() - self._last_scan >= self.rescan_interval:
+                self._scan()  # includes this object, which is already on disk
+            if sha256 not in self._objects:
+                self._objects[sha256] = size
+                self._total += size
+            self._objects.move_to_end(sha256)
+            self._evict()
+
+        ref_path = self._ref_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self._refs_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta._asdict(), f)
+        os.replace(tmp_path, ref_path)
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self.prune_refs()
+        return meta
+
+    def _evict(self):
+        """Drop least-recently-used objects until under max_bytes. Caller holds the lock."""
+        while self._objects and self._total > self.max_bytes:
+            sha256, size = self._objects.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self.object_path(sha256))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_ref(ref_path: str):
+        try:
+            os.remove(ref_path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        with self._lock:
+            return {
+                "objects": len(self._objects),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "pruned_refs": self.pruned_refs,
+            }
+
+
+class BlobWriter:
+    """
+    Incremental put(): chunks go to a temp file while their sha256 is computed,
+    so a blob of any size is stored without holding it in memory.
+
+    Nothing is visible to lookup() until commit(). abort() discards the temp
+    file, e.g. when the download it was teeing off was cut short. A blob that
+    grows past the store's max_bytes is dropped rather than stored.
+    """
+
+    def __init__(self, store: BlobStore, key: str, content_type: str, ttl: Optional[float]):
+        self.store = store
+        self.key = key
+        self.content_type = content_type
+        self.ttl = ttl
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=store._objects_dir, prefix=".tmp-")
+        self._file = os.fdopen(fd, "wb")
+
+    @property
+    def active(self) -> bool:
+        """False once committed, aborted or grown too large."""
+        return self._file is not None
+
+    def write(self, chunk: bytes):
+        if self._file is None:
+            return
+        self.size += len(chunk)
+        if self.size > self.store.max_bytes:
+            self.abort()
+            return
+        self._file.write(chunk)
+        self._hash.update(chunk)
+
+    def commit(self) -> Optional[BlobMeta]:
+        """File the blob under key. Returns None if it was aborted or too large."""
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        sha256 = self._hash.hexdigest()
+        path = self.store.object_path(sha256)
+        if os.path.exists(path):
+            self._discard()
+        else:
+            os.replace(self._tmp_path, path)
+        return self.store._commit(self.key, sha256, self.size, self.content_type, self.ttl)
+
+    def abort(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._discard()
+
+    def _discard(self):
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,642 @@
+"""
+Caching primitives for Edumate Backend
+Two-tier response caches used to avoid repeated upstream ERP round-trips:
+an in-process LRU (L1) on top of a store shared by all workers (L2).
+"""
+
+from collections import OrderedDict
+from typing import Optional, Dict, Any, NamedTuple, Callable, Awaitable
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import random
+import sqlite3
+import struct
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # Optional: only needed for CACHE_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(NamedTuple):
+    """A cached, already-serialized response body."""
+    value: bytes
+    stored_at: float
+    expires_at: Optional[float]  # None means no time-based expiry
+    etag: Optional[str] = None
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.sha256(body).hexdigest() + '"'
+
+
+class TTLCache:
+    """
+    Memory-capped LRU cache with per-entry TTLs.
+
+    Values are raw bytes (serialized responses), so the memory cap is tracked
+    as the total size of stored values rather than the number of entries.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """
+        Return the entry for key (marking it recently used), or None.
+
+        Expired entries are dropped on access.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at is not None and entry.expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for key, or None on miss."""
+        entry = self.get_entry(key)
+        return entry.value if entry else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None,
+            stored_at: Optional[float] = None) -> CacheEntry:
+        """
+        Store value under key.
+
+        The ETag is computed once here, so hits can answer If-None-Match
+        without hashing the body again.
+
+        Args:
+            key: Cache key
+            value: Serialized response body
+            ttl: Seconds until the entry expires (None = until evicted)
+            stored_at: Original store time, when copying an existing entry
+
+        Returns:
+            The stored entry
+        """
+        now = stored_at if stored_at is not None else time.time()
+        entry = CacheEntry(value, now, now + ttl if ttl is not None else None, make_etag(value))
+        if len(value) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += len(value)
+            while self._entries and (self._size > self.max_bytes or len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return entry
+
+    def delete(self, key: str):
+        """Remove key from the cache if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class CacheBackend:
+    """
+    Interface for a shared (L2) cache store.
+
+    Implementations are synchronous; TieredCache runs them off the event loop.
+    """
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CacheEntry):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """In-process stand-in for a shared store, for tests and single-worker runs."""
+
+    def __init__(self):
+        self._entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Shared store in a local SQLite file in WAL mode.
+
+    Every worker on the host opens the same file, so hits are shared and the
+    cache survives worker recycling and restarts.
+    """
+
+    PURGE_EVERY = 256  # sets between expiry/size sweeps
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sets = 0
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(bytes(row[0]), row[1], row[2])
+        if entry.expires_at is not None and entry.expires_at <= time.time():
+            return None
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, entry.value, entry.stored_at, entry.expires_at),
+            )
+            self._sets += 1
+            if self._sets % self.PURGE_EVERY == 0:
+                self._purge()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _purge(self):
+        """Drop expired rows, then the oldest rows beyond max_entries."""
+        self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class RedisBackend(CacheBackend):
+    """Shared store in a Redis-protocol server (Redis, Valkey, KeyDB, ...)."""
+
+    _HEADER = struct.Struct("!d")  # stored_at, prefixed to the value
+
+    def __init__(self, url: str, prefix: str = "edumate:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raw, ttl_ms = self._client.pipeline().get(self.prefix + key).pttl(self.prefix + key).execute()
+        if raw is None:
+            return None
+        (stored_at,) = self._HEADER.unpack_from(raw)
+        expires_at = time.time() + ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else None
+        return CacheEntry(raw[self._HEADER.size:], stored_at, expires_at)
+
+    def set(self, key: str, entry: CacheEntry):
+        px = None
+        if entry.expires_at is not None:
+            px = int((entry.expires_at - time.time()) * 1000)
+            if px <= 0:
+                return
+        self._client.set(self.prefix + key, self._HEADER.pack(entry.stored_at) + entry.value, px=px)
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+
+def create_cache_backend() -> Optional[CacheBackend]:
+    """
+    Build the shared L2 store from the environment.
+
+    CACHE_BACKEND selects "sqlite" (default), "redis", "memory" or "none".
+    If the store cannot be opened the caches run L1-only.
+    """
+    kind = os.environ.get("CACHE_BACKEND", "sqlite").lower()
+    try:
+        if kind == "sqlite":
+            return SQLiteBackend(os.environ.get("CACHE_SQLITE_PATH", "/tmp/edumate-cache.sqlite3"))
+        if kind == "redis":
+            return RedisBackend(os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        if kind == "memory":
+            return MemoryBackend()
+    except Exception as e:
+        logger.error(f"Failed to open {kind} cache backend, using in-process cache only: {str(e)}")
+    return None
+
+
+class CounterBackend:
+    """
+    Interface for counters shared by every worker, e.g. rate-limit windows.
+
+    incr() must be atomic: concurrent increments from any worker or node are
+    never lost. Implementations are synchronous, like CacheBackend.
+    """
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        """Add amount to key (creating it with the given TTL) and return the new value."""
+        raise NotImplementedError
+
+    def get(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryCounterBackend(CounterBackend):
+    """In-process stand-in for a shared counter store, for tests and single-worker runs."""
+
+    PURGE_EVERY = 1024  # increments between expiry sweeps
+
+    def __init__(self):
+        self._counters: Dict[str, list] = {}  # key -> [value, expires_at]
+        self._lock = threading.Lock()
+        self._incrs = 0
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        now = time.time()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[1] <= now:
+                counter = self._counters[key] = [0, now + ttl]
+            counter[0] += amount
+            self._incrs += 1
+            if self._incrs % self.PURGE_EVERY == 0:
+                self._counters = {k: c for k, c in self._counters.items() if c[1] > now}
+            return counter[0]
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter[0] if counter is not None and counter[1] > time.time() else 0
+
+
+class SQLiteCounterBackend(CounterBackend):
+    """
+    Counters in a local SQLite file in WAL mode, shared by the workers on a host.
+
+    Each increment is a single UPSERT ... RETURNING statement, which SQLite
+    runs atomically under its write lock. Counters survive restarts.
+    """
+
+    PURGE_EVERY = 512  # increments between expiry sweeps
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._incrs = 0
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        now = time.time()
+        with self._lock:
+            (value,) = self._conn.execute(
+                "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+                "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+                "RETURNING value",
+                (key, amount, now + ttl, now, now),
+            ).fetchone()
+            self._incrs += 1
+            if self._incrs % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+            return value
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+
+class RedisCounterBackend(CounterBackend):
+    """Counters in a Redis-protocol server, shared by every worker and node (INCRBY)."""
+
+    def __init__(self, url: str, prefix: str = "edumate:count:"):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        value, _ = (self._client.pipeline()
+                    .incrby(self.prefix + key, amount)
+                    .expire(self.prefix + key, math.ceil(ttl))
+                    .execute())
+        return value
+
+    def get(self, key: str) -> int:
+        return int(self._client.get(self.prefix + key) or 0)
+
+
+def create_counter_backend() -> Optional[CounterBackend]:
+    """
+    Build the shared counter store from the environment.
+
+    RATE_LIMIT_BACKEND selects "sqlite" (default), "redis", "memory" or
+    "none". None means counters stay private to each worker.
+    """
+    kind = os.environ.get("RATE_LIMIT_BACKEND", "sqlite").lower()
+    try:
+        if kind == "sqlite":
+            return SQLiteCounterBackend(os.environ.get("RATE_LIMIT_SQLITE_PATH", "/tmp/edumate-ratelimit.sqlite3"))
+        if kind == "redis":
+            return RedisCounterBackend(os.environ.get("RATE_LIMIT_REDIS_URL")
+                                       or os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        if kind == "memory":
+            return MemoryCounterBackend()
+    except Exception as e:
+        logger.error(f"Failed to open {kind} counter backend, using per-worker counters: {str(e)}")
+    return None
+
+
+class TieredCache:
+    """
+    In-process LRU (L1) in front of an optional shared store (L2).
+
+    Reads check L1 first, then L2, promoting L2 hits into L1. Writes go to
+    both. Keys are namespaced so several caches can share one L2 store.
+    L2 errors are logged and treated as misses; the cache never fails a request.
+    """
+
+    def __init__(self, l1: TTLCache, l2: Optional[CacheBackend] = None, namespace: str = ""):
+        self.l1 = l1
+        self.l2 = l2
+        self.namespace = namespace
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        entry = self.l1.get_entry(key)
+        if entry is not None or self.l2 is None:
+            return entry
+        try:
+            entry = await asyncio.to_thread(self.l2.get, self.namespace + key)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 cache read failed: {str(e)}")
+            return None
+        if entry is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        ttl = entry.expires_at - entry.stored_at if entry.expires_at is not None else None
+        return self.l1.set(key, entry.value, ttl, stored_at=entry.stored_at)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = await self.get_entry(key)
+        return entry.value if entry else None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None,
+                  stored_at: Optional[float] = None) -> CacheEntry:
+        entry = self.l1.set(key, value, ttl, stored_at=stored_at)
+        if self.l2 is None:
+            return entry
+        try:
+            await asyncio.to_thread(self.l2.set, self.namespace + key, entry)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 cache write failed: {str(e)}")
+        return entry
+
+    async def delete(self, key: str):
+        self.l1.delete(key)
+        if self.l2 is not None:
+            try:
+                await asyncio.to_thread(self.l2.delete, self.namespace + key)
+            except Exception as e:
+                self.l2_errors += 1
+                logger.warning(f"L2 cache delete failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        return {
+            "l1": self.l1.stats(),
+            "l2": {
+                "backend": type(self.l2).__name__ if self.l2 else None,
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "errors": self.l2_errors,
+            },
+        }
+
+
+def should_revalidate(entry: CacheEntry, soft_ttl: float, recompute_seconds: float,
+                      beta: float = 1.0) -> bool:
+    """
+    Decide whether an entry should be refreshed, with probabilistic early expiry.
+
+    Implements XFetch: as an entry approaches soft_ttl, each read has a growing
+    chance of triggering a refresh, scaled by how long a refresh takes. Popular
+    keys therefore refresh a little early at random instead of all at once.
+
+    Args:
+        entry: The cached entry
+        soft_ttl: Age in seconds after which the entry is definitely stale
+        recompute_seconds: Typical time to fetch a fresh value
+        beta: Values above 1.0 favour earlier refreshes
+
+    Returns:
+        True if the caller should refresh the entry
+    """
+    age = time.time() - entry.stored_at
+    jitter = -recompute_seconds * beta * math.log(1.0 - random.random())
+    return age + jitter >= soft_ttl
+
+
+class RunningAverage:
+    """Exponentially weighted moving average, e.g. of upstream latency."""
+
+    def __init__(self, initial: float = 0.0, alpha: float = 0.2):
+        self.value = initial
+        self.alpha = alpha
+
+    def observe(self, sample: float):
+        self.value += self.alpha * (sample - self.value)
+
+
+class RefreshSource(NamedTuple):
+    """How to refresh a reference entry, and until when that is allowed."""
+    fetch: Callable[[], Awaitable[Optional[bytes]]]
+    last_access: float
+    expires_at: Optional[float]  # when fetch's credentials lapse; None if they don't
+
+
+class ReferenceCache:
+    """
+    Institution-wide cache for reference data that is identical for every student.
+
+    Each entry remembers how it was last fetched, so a background task can
+    refresh it on a schedule and students keep hitting a warm entry instead of
+    the ERP. Only keys upstream has answered are refreshed, at most max_keys of
+    them (least recently read dropped first). Each read swaps in the reader's
+    fetcher, so a refresh uses the most recent caller's credentials and never
+    past their expires_at. Entries nobody has read for idle_timeout seconds,
+    or whose refresh fails, stop being refreshed until they are read again.
+    """
+
+    def __init__(self, ttl: float = 6 * 3600, refresh_interval: float = 900,
+                 idle_timeout: float = 6 * 3600, max_bytes: int = 4 * 1024 * 1024,
+                 max_keys: int = 256, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.idle_timeout = idle_timeout
+        self.max_keys = max_keys
+        self._store = TieredCache(TTLCache(max_bytes=max_bytes), backend, namespace="ref:")
+        self._sources: "OrderedDict[str, RefreshSource]" = OrderedDict()  # least recently read first
+        self.hits = 0
+        self.misses = 0
+        self.upstream_fetches = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _register(self, key: str, fetch: Callable[[], Awaitable[Optional[bytes]]],
+                  expires_at: Optional[float]):
+        self._sources[key] = RefreshSource(fetch, time.time(), expires_at)
+        self._sources.move_to_end(key)
+        while len(self._sources) > self.max_keys:
+            self._sources.popitem(last=False)
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Optional[bytes]]],
+                  expires_at: Optional[float] = None) -> Optional[bytes]:
+        """
+        Return the cached body for key, calling fetch() on a miss.
+
+        Args:
+            key: Cache key (institution + endpoint + params)
+            fetch: Coroutine factory returning the body bytes, or None on failure
+            expires_at: When the credentials fetch uses lapse; it is not used
+                for refreshes after that
+
+        Returns:
+            Body bytes, or None if the entry is missing and the fetch failed
+        """
+        cached = await self._store.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._register(key, fetch, expires_at)
+            return cached
+
+        self.misses += 1
+        self.upstream_fetches += 1
+        body = await fetch()
+        if body is not None:
+            await self._store.set(key, body, self.ttl)
+            self._register(key, fetch, expires_at)
+        return body
+
+    async def refresh_all(self):
+        """Re-fetch every recently used entry."""
+        now = time.time()
+        for key, source in list(self._sources.items()):
+            if now - source.last_access > self.idle_timeout or \
+                    (source.expires_at is not None and source.expires_at <= now):
+                self._sources.pop(key, None)
+                continue
+            self.upstream_fetches += 1
+            try:
+                body = await source.fetch()
+            except Exception as e:
+                body = None
+                logger.warning(f"Reference refresh failed for {key}: {str(e)}")
+            if body is None:
+                # Keep serving the previous copy until its TTL runs out, but
+                # stop retrying until a reader brings fresh credentials
+                self.refresh_failures += 1
+                if self._sources.get(key) is source:
+                    del self._sources[key]
+                continue
+            await self._store.set(key, body, self.ttl)
+            self.refreshes += 1
+
+    async def run_refresher(self):
+        """Background loop refreshing entries every refresh_interval seconds."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_all()
+            except Exception as e:
+                logger.error(f"Reference cache refresher error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._sources),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "upstream_fetches": self.upstream_fetches,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "store": self._store.stats(),
+        }
@@ -0,0 +1,97 @@
+"""
+Response compression for Edumate Backend
+Negotiates a Content-Encoding from Accept-Encoding and compresses JSON bodies.
+gzip is always available; brotli and zstd are used when their packages are.
+"""
+
+from typing import Optional, Dict, Callable, List, Tuple
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Optional: `pip install brotli` enables br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: `pip install zstandard` enables zstd
+    zstandard = None
+
+# Bodies smaller than this gain little and cost a round of compression
+DEFAULT_MIN_SIZE = 1024
+
+# Only JSON API bodies are compressed: PDFs, images and documents are already
+# compressed or streamed through, and NDJSON/SSE must not be buffered.
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def _gzip(body: bytes) -> bytes:
+    # Level 6 is zlib's default trade-off; mtime=0 keeps the output deterministic
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+CODECS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+if brotli is not None:
+    # Quality 5 compresses JSON smaller than gzip -6 at a similar speed
+    CODECS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _zstd = zstandard.ZstdCompressor(level=3)
+    CODECS["zstd"] = _zstd.compress
+
+# Server preference when the client accepts several encodings equally
+PREFERENCE = ("zstd", "br", "gzip")
+
+
+def _parse_accept_encoding(header: str) -> List[Tuple[str, float]]:
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted.append((name, q))
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the encoding to use for a request.
+
+    Returns:
+        An encoding in CODECS the client accepts with q > 0, preferring higher
+        q and then PREFERENCE; None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+    accepted = _parse_accept_encoding(accept_encoding)
+    weights = dict(accepted)
+    wildcard = weights.get("*")
+    best, best_q = None, 0.0
+    for name in PREFERENCE:
+        if name not in CODECS:
+            continue
+        q = weights.get(name, wildcard if wildcard is not None else 0.0)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(";")[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return CODECS[encoding](body)
+
+
+def weak_etag(etag: str) -> str:
+    """A compressed variant is not byte-identical to the identity body, so its ETag is weak."""
+    return etag if etag.startswith("W/") else "W/" + etag
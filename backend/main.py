@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException, Request, Response, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, List, Any, Union, Tuple, NamedTuple
+from urllib.parse import urlencode, parse_qs
 import httpx
 import json
 import asyncio
 import base64
 import hashlib
+import hmac
+import logging
 import random
 import time
 from contextlib import asynccontextmanager
@@ -15,14 +19,26 @@ import os
 import jwt
 from crypto_utils import encrypt_data, decrypt_data
 from sheets_logger import sheets_logger
+from cache import TTLCache, TieredCache, ReferenceCache, CacheEntry, RunningAverage, should_revalidate, create_cache_backend, make_etag
+from content_encoding import DEFAULT_MIN_SIZE, negotiate, is_compressible, compress, weak_etag
+from upstream import SingleFlight, VariantMemory, FallbackPredictor, UpstreamStream, request_key
+from blob_store import BlobStore, BlobMeta, BlobWriter
+from ttl_policy import SLOW_CHANGING, policy, classify_path, classify_semester, classify_semester_list, classify_by_guid, PROFILE_IMAGE_CACHE_CONTROL
 from security import (
     validate_request_authorization,
     enforce_rate_limit,
     sanitize_input,
     audit_logger,
-    validate_studtbl_id_format
+    validate_studtbl_id_format,
+    decode_studtbl_id,
+    rate_limiter,
+    token_claims,
+    claims_cache,
+    accepted_tokens
 )
 
+logger = logging.getLogger(__name__)
+
 # SECRET KEY for accessing logs — must be set via environment variable in production
 LOGS_SECRET_KEY = os.environ.get("LOGS_SECRET_KEY")
 if not LOGS_SECRET_KEY:
@@ -36,13 +52,28 @@ if not LOGS_SECRET_KEY:
 async def lifespan(app: FastAPI):
     limits = httpx.Limits(max_keepalive_connections=20, max_connections=40)
     app.state.client = httpx.AsyncClient(limits=limits, timeout=20.0, verify=False)
+    refresher = asyncio.create_task(reference_cache.run_refresher())
     yield
+    refresher.cancel()
     await app.state.client.aclose()
 
 @asynccontextmanager
 async def get_client(request: Request):
     yield request.app.state.client
 
+# Identical concurrent upstream GETs (same URL, params and token) share one call
+upstream_flight = SingleFlight()
+# Which spelling / report name each institution's ERP accepts
+upstream_variants = VariantMemory()
+# Per (institution, semester): does exam status usually need the previous semester too?
+exam_status_fallbacks = FallbackPredictor()
+
+async def upstream_get(client: httpx.AsyncClient, url: str, params: Optional[dict] = None,
+                       headers: Optional[dict] = None) -> httpx.Response:
+    params = dict(params or {})
+    key = request_key("GET", url, params, (headers or {}).get("Authorization", ""))
+    return await upstream_flight.do(key, lambda: client.get(url, params=params, headers=headers))
+
 # Disable API docs in production
 ENVIRONMENT = os.environ.get("ENVIRONMENT", "development")
 is_production = ENVIRONMENT.lower() == "production"
@@ -81,17 +112,109 @@ app.add_middleware(
 @app.middleware("http")
 async def add_cache_control_header(request: Request, call_next):
     response = await call_next(request)
-    if request.method == "GET" and response.status_code == 200:
+    # 304s carry the same policy as the 200 they revalidate.
+    # Handlers that know better (e.g. immutable past-semester data) set their own header.
+    if request.method == "GET" and response.status_code in (200, 304) and "Cache-Control" not in response.headers:
         path = request.url.path
-        if "/api/dashboard/stats" in path or "/api/student/academic" in path or "/api/student/personal" in path or "/api/student/parent" in path:
-            response.headers["Cache-Control"] = "public, max-age=1800"  # 30 mins
-        elif "/api/profile/image" in path:
-            response.headers["Cache-Control"] = "public, max-age=86400" # 1 day
-        elif "/api/attendance/" in path or "/api/reports/" in path or "/api/student/exam-status" in path or "/api/hallticket/" in path:
-            # 5 mins for volatile data
-            response.headers["Cache-Control"] = "public, max-age=300"
+        if "/api/profile/image" in path:
+            response.headers["Cache-Control"] = PROFILE_IMAGE_CACHE_CONTROL
+        else:
+            decision = classify_path(path)
+            if decision:
+                response.headers["Cache-Control"] = decision.cache_control
     return response
 
+@app.middleware("http")
+async def add_etag_header(request: Request, call_next):
+    """
+    Strong ETags for JSON GET responses, answering If-None-Match with 304.
+    Cached responses already carry their ETag, so only fresh bodies are hashed here.
+    """
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != 200:
+        return response
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return response
+
+    etag = response.headers.get("ETag")
+    body = None
+    if etag is None:
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = make_etag(body)
+
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    headers["ETag"] = etag
+    if etag_matches(request, etag):
+        # Content-Type stays for compress_response, which removes it from 304s
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        return response
+    return Response(content=body, status_code=response.status_code, headers=headers)
+
+# Compressed bodies by (encoding, ETag). Hits on the response cache carry the
+# entry's ETag, so a hot entry is compressed once rather than on every hit.
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", DEFAULT_MIN_SIZE))
+COMPRESSED_CACHE_MAX_BYTES = int(os.environ.get("COMPRESSED_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+compressed_variants = TTLCache(max_bytes=COMPRESSED_CACHE_MAX_BYTES)
+compression_stats = {"compressed": 0, "variant_hits": 0, "bytes_in": 0, "bytes_out": 0}
+
+@app.middleware("http")
+async def compress_response(request: Request, call_next):
+    """
+    Compress JSON bodies with the best encoding the client accepts (zstd, br
+    or gzip, as installed). Runs outside add_etag_header so every body it sees
+    has an ETag to key the compressed variant by.
+
+    Whenever an encoding is negotiated the ETag is made weak, even for bodies
+    too small to compress, so a JSON 304 gets the same validator and Vary as
+    the 200 it revalidates without knowing the body's size.
+    """
+    response = await call_next(request)
+    if response.status_code not in (200, 304) or "content-encoding" in response.headers:
+        return response
+    if not is_compressible(response.headers.get("content-type")):
+        return response
+
+    vary = response.headers.get("Vary")
+    response.headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    etag = response.headers.get("ETag")
+    if response.status_code == 304:
+        del response.headers["content-type"]
+        if encoding is not None and etag:
+            response.headers["etag"] = weak_etag(etag)
+        return response
+    if encoding is None:
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    if etag:
+        headers["etag"] = weak_etag(etag)
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return Response(content=body, status_code=response.status_code, headers=headers)
+
+    variant_key = f"{encoding}:{etag}"
+    compressed = compressed_variants.get(variant_key) if etag else None
+    if compressed is None:
+        # Large bodies are compressed off the event loop (zlib releases the GIL)
+        if len(body) > 64 * 1024:
+            compressed = await asyncio.to_thread(compress, body, encoding)
+        else:
+            compressed = compress(body, encoding)
+        if etag:
+            compressed_variants.set(variant_key, compressed)
+        compression_stats["compressed"] += 1
+    else:
+        compression_stats["variant_hits"] += 1
+    compression_stats["bytes_in"] += len(body)
+    compression_stats["bytes_out"] += len(compressed)
+
+    headers["content-encoding"] = encoding
+    return Response(content=compressed, status_code=response.status_code, headers=headers)
+
+# Each bearer token gets 100 requests a minute; every token from one IP shares this
+RATE_LIMIT_PER_IP = int(os.environ.get("RATE_LIMIT_PER_IP", 1000))
+
 @app.middleware("http")
 async def security_middleware(request: Request, call_next):
     """
@@ -101,10 +224,17 @@ async def security_middleware(request: Request, call_next):
     if request.url.path in ["/", "/api/health", "/docs", "/redoc", "/openapi.json"]:
         return await call_next(request)
 
+    # Resolved once here; handlers read it back through resolve_identity()
+    identity = resolve_identity(request)
+
     # Apply rate limiting (except for login endpoint which has its own limits)
     if request.url.path != "/api/login":
         try:
-            await enforce_rate_limit(request)
+            await enforce_rate_limit(request, identity.rate_limit_key)
+            if identity.token_hash:
+                # The token is not signature-checked here, so made-up tokens
+                # must still fit within a budget for the whole IP
+                await enforce_rate_limit(request, f"net:{identity.client_ip}", max_requests=RATE_LIMIT_PER_IP)
         except HTTPException as e:
             return Response(
                 content=json.dumps({"error": e.detail}),
@@ -144,27 +274,571 @@ TEST_FIRST_NAMES = ["Arjun", "Kavin", "Nithin", "Rithik", "Vignesh", "Harini", "
 TEST_LAST_NAMES = ["Kumar", "Raj", "S", "M", "R", "N", "T", "Balan"]
 TEST_BRANCHES = [("CSE", "CS"), ("ECE", "EC"), ("EEE", "EE"), ("IT", "IT"), ("MECH", "ME")]
 
-def get_institution_config(request: Request):
+class RequestIdentity(NamedTuple):
+    """Who a request is from and how to call upstream for it, resolved once per request."""
+    inst_id: str
+    base_url: str
+    upstream_headers: Dict[str, str]
+    user_id: Optional[str]  # user id claim of the bearer token
+    studtbl_id: Optional[str]  # the same id, normalized (base64-decoded)
+    is_test_user: bool
+    claims: Dict[str, Any]
+    client_ip: str
+    token_hash: Optional[str]  # sha256 of the bearer token, if one was sent
+
+    @property
+    def rate_limit_key(self) -> str:
+        # A whole campus can sit behind one NAT IP, so signed-in users are limited
+        # individually. By token, not by the unverified user id claim: otherwise
+        # anyone could mint tokens naming a student and use up that student's budget.
+        return f"token:{self.token_hash}" if self.token_hash else f"ip:{self.client_ip}"
+
+def resolve_identity(request: Request) -> RequestIdentity:
     """
-    Determines the institution from the 'X-Institution-Id' header.
-    Returns (base_url, headers_dict).
+    The request's identity, computed on first use (normally by security_middleware)
+    and kept on request.state for the middleware and every handler after it.
     """
+    identity = getattr(request.state, "identity", None)
+    if identity is not None:
+        return identity
+
     inst_id = request.headers.get("X-Institution-Id", DEFAULT_INSTITUTION).upper()
     if inst_id not in INSTITUTIONS:
         inst_id = DEFAULT_INSTITUTION
-        
     config = INSTITUTIONS[inst_id]
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Referer": config["Referer"],
-        "Origin": config["Origin"],
-        "Content-Type": "application/json",
-        "institutionguid": config["institutionguid"],
-        "Authorization": request.headers.get("Authorization", "")
+    auth_header = request.headers.get("Authorization", "")
+    claims = token_claims(auth_header) if auth_header.startswith("Bearer ") else None
+
+    identity = RequestIdentity(
+        inst_id=inst_id,
+        base_url=config["BASE_URL"],
+        upstream_headers={
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Referer": config["Referer"],
+            "Origin": config["Origin"],
+            "Content-Type": "application/json",
+            "institutionguid": config["institutionguid"],
+            "Authorization": auth_header
+        },
+        user_id=claims.user_id if claims else None,
+        studtbl_id=claims.normalized_user_id if claims else None,
+        is_test_user=claims.is_test_user if claims else False,
+        claims=claims.claims if claims else {},
+        client_ip=request.client.host if request.client else "unknown",
+        token_hash=hashlib.sha256(auth_header[7:].encode()).hexdigest()[:32] if claims else None,
+    )
+    request.state.identity = identity
+    return identity
+
+def get_institution_id(request: Request) -> str:
+    """Returns the validated institution id from the 'X-Institution-Id' header."""
+    return resolve_identity(request).inst_id
+
+def get_institution_config(request: Request):
+    """
+    Determines the institution from the 'X-Institution-Id' header.
+    Returns (base_url, headers_dict); the dict is the caller's to modify.
+    """
+    identity = resolve_identity(request)
+    return identity.base_url, dict(identity.upstream_headers)
+
+# ============================================================
+#  RESPONSE CACHE (per-student, already-serialized bodies)
+# ============================================================
+# L1 is per worker; L2 (CACHE_BACKEND) is shared by every worker on the host,
+# so adding gunicorn workers doesn't divide the hit rate.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+shared_cache_backend = create_cache_backend()
+response_cache = TieredCache(TTLCache(max_bytes=RESPONSE_CACHE_MAX_BYTES), shared_cache_backend, namespace="resp:")
+
+# Server-side TTLs in seconds. Profile data changes at most once a semester.
+PROFILE_CACHE_TTLS = {
+    "personal": 1800,
+    "academic": 1800,
+    "parent": 1800,
+    "academic_percentage": 3600,
+    "identifiers": 3600,
+}
+
+def student_cache_key(inst_id: str, studtbl_id: str, section: str) -> str:
+    """Cache key for a student's data, independent of how the id was URL-encoded."""
+    return f"{inst_id}:{decode_studtbl_id(studtbl_id)}:{section}"
+
+def encode_json(data) -> bytes:
+    """Serialize like FastAPI's JSONResponse so cached and fresh bodies are identical."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers etag."""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+async def get_student_entry(request: Request, key: str) -> Optional[CacheEntry]:
+    """
+    A student's cached entry, but only for a token upstream has already accepted.
+    Ownership is checked against unverified claims, so any other token misses
+    and must get its data from upstream (see security.AcceptedTokens).
+    """
+    if request.headers.get("Authorization") not in accepted_tokens:
+        return None
+    return await response_cache.get_entry(key)
+
+def cached_json_response(request: Request, entry: CacheEntry) -> Response:
+    """Serve a cache entry, answering a matching If-None-Match with 304 and no body."""
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers={"ETag": entry.etag}, media_type="application/json")
+    return Response(content=entry.value, media_type="application/json", headers={"ETag": entry.etag})
+
+# Background revalidations currently running, by cache key
+_refresh_tasks: dict = {}
+
+def schedule_refresh(key: str, fetch):
+    """Run fetch() in the background unless a refresh for key is already running."""
+    if key in _refresh_tasks:
+        return
+    task = asyncio.create_task(fetch())
+    _refresh_tasks[key] = task
+    task.add_done_callback(lambda _: _refresh_tasks.pop(key, None))
+
+async def current_semester(request: Request, studtblId: str) -> Optional[int]:
+    """
+    The student's current semester from the cached academic section, or None.
+    Only consults the cache: classifying a response must never cost an upstream call.
+    """
+    entry = await response_cache.get_entry(student_cache_key(get_institution_id(request), studtblId, "academic"))
+    if entry is None:
+        return None
+    try:
+        return int(json.loads(entry.value).get("semester"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+# ============================================================
+#  BUNDLES (several sections in one response)
+# ============================================================
+def section_ok(body: bytes, **extra) -> bytes:
+    """A successful bundle section. body is already-encoded JSON and is spliced in as is."""
+    head = encode_json({"status": "ok", **extra})[:-1]
+    return head + b',"data":' + body + b'}'
+
+def section_error(message: str, **extra) -> bytes:
+    return encode_json({"status": "error", "error": message, **extra})
+
+def join_sections(sections: dict) -> bytes:
+    """Join encoded sections into one JSON object, keyed by section name."""
+    return b"{" + b",".join(encode_json(name) + b":" + body for name, body in sections.items()) + b"}"
+
+def encode_section(name: str, result, elapsed: float) -> Tuple[str, bytes]:
+    """
+    Encode a loader's result as a section.
+
+    A loader returns a JSON value (a dict with an "error" key, or None, marks a
+    failed section), a CacheEntry or an already-encoded JSON body.
+
+    Returns:
+        (status, encoded section)
+    """
+    if result is None:
+        return "error", section_error(f"Failed to fetch {name}", elapsed_ms=elapsed)
+    if isinstance(result, dict) and "error" in result:
+        return "error", section_error(str(result["error"]), elapsed_ms=elapsed)
+    if isinstance(result, CacheEntry):
+        return "ok", section_ok(result.value, elapsed_ms=elapsed)
+    if isinstance(result, bytes):
+        return "ok", section_ok(result, elapsed_ms=elapsed)
+    return "ok", section_ok(encode_json(result), elapsed_ms=elapsed)
+
+async def iter_sections(loaders: dict, deadline: float):
+    """
+    Run section loaders concurrently under one shared deadline, yielding
+    (name, status, encoded section, elapsed_ms) as each one finishes. Sections
+    still running at the deadline are cancelled and yielded as timed out.
+    """
+    started = time.monotonic()
+    names = {asyncio.create_task(load()): name for name, load in loaders.items()}
+    pending = set(names)
+    try:
+        while pending:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            elapsed = round((time.monotonic() - started) * 1000, 1)
+            for task in done:
+                result = None if task.exception() else task.result()
+                status, body = encode_section(names[task], result, elapsed)
+                yield names[task], status, body, elapsed
+        for task in pending:
+            elapsed = round(deadline * 1000, 1)
+            yield names[task], "timeout", encode_json({"status": "timeout", "error": "Timed out", "elapsed_ms": elapsed}), elapsed
+    finally:
+        for task in pending:
+            task.cancel()
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def stream_event(event: str, name: Optional[str], body: bytes, stream: str) -> bytes:
+    """One NDJSON line or SSE event; body is an encoded JSON object."""
+    head = {"type": event, "name": name} if name is not None else {"type": event}
+    line = encode_json(head)[:-1] + b"," + body[1:]
+    if stream == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + line + b"\n\n"
+    return line + b"\n"
+
+async def run_sections(loaders: dict, deadline: float, stream: Optional[str] = None) -> Response:
+    """
+    Run section loaders concurrently under one shared deadline (see iter_sections).
+
+    By default the sections are joined into one JSON object once all have finished,
+    with their elapsed_ms also sent as a Server-Timing header. With stream="ndjson"
+    or "sse" each section is flushed as soon as it finishes, so the client can
+    render fast sections without waiting for the slowest; a final summary event
+    lists every section's status.
+    """
+    if stream:
+        async def events():
+            started = time.monotonic()
+            statuses = {}
+            async for name, status, body, _ in iter_sections(loaders, deadline):
+                statuses[name] = status
+                yield stream_event("section", name, body, stream)
+            summary = encode_json({"statuses": statuses, "elapsed_ms": round((time.monotonic() - started) * 1000, 1)})
+            yield stream_event("summary", None, summary, stream)
+
+        return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[stream],
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    sections, timings = {}, {}
+    async for name, _, body, elapsed in iter_sections(loaders, deadline):
+        sections[name], timings[name] = body, elapsed
+    ordered = {name: sections[name] for name in loaders}
+    server_timing = ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+    return Response(content=join_sections(ordered), media_type="application/json",
+                    headers={"Server-Timing": server_timing})
+
+def static_section(value):
+    """A loader for data that is already at hand, e.g. test-user fixtures."""
+    async def load():
+        return value
+    return load
+
+# ============================================================
+#  REFERENCE DATA CACHE (shared by every student of an institution)
+# ============================================================
+reference_cache = ReferenceCache(
+    ttl=int(os.environ.get("REFERENCE_CACHE_TTL", 6 * 3600)),
+    refresh_interval=int(os.environ.get("REFERENCE_CACHE_REFRESH_INTERVAL", 900)),
+    max_keys=int(os.environ.get("REFERENCE_CACHE_MAX_KEYS", 256)),
+    backend=shared_cache_backend,
+)
+
+async def get_reference_data(request: Request, upstream_path: str, params: dict, error_message: str):
+    """Serve non-personal reference data from the institution-wide cache."""
+    body = await load_reference_data(request, upstream_path, params)
+    if body is None:
+        return {"error": error_message}
+    return json_response(body)
+
+async def load_reference_data(request: Request, upstream_path: str, params: dict) -> Optional[bytes]:
+    """
+    Raw reference data body from the institution-wide cache, or None if upstream failed.
+    The fetcher is kept for background refreshes, so it must not depend on the request object.
+    It carries the caller's token, so it is only used until that token expires.
+    """
+    inst_id = get_institution_id(request)
+    base_url, headers = get_institution_config(request)
+    client = request.app.state.client
+    key = f"{inst_id}:{upstream_path}:{json.dumps(params, sort_keys=True)}"
+
+    async def fetch() -> Optional[bytes]:
+        try:
+            resp = await upstream_get(client, f"{base_url}/{upstream_path}", params=params, headers=headers)
+            if resp.status_code == 200:
+                resp.json()  # Only cache well-formed JSON
+                return resp.content
+        except Exception as e:
+            pass
+        return None
+
+    auth_header = headers.get("Authorization", "")
+    expires_at = token_claims(auth_header).expires_at if auth_header.startswith("Bearer ") else None
+    return await reference_cache.get(key, fetch, expires_at)
+
+# ============================================================
+#  BLOB STORE (documents and profile images, on disk)
+# ============================================================
+blob_store = BlobStore(
+    os.environ.get("BLOB_CACHE_DIR", "/tmp/edumate-blobs"),
+    max_bytes=int(os.environ.get("BLOB_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+)
+
+def blob_key(request: Request, studtblId: str, documentId: str, documentType: str = "") -> str:
+    """Blobs are immutable per documentId, so the key never needs a TTL."""
+    return BlobStore.make_key(get_institution_id(request), decode_studtbl_id(studtblId), documentId, documentType)
+
+async def serve_stored_blob(request: Request, key: str, headers: Optional[dict] = None,
+                            store: Optional[BlobStore] = None) -> Optional[Response]:
+    """
+    Serve a blob from disk (or 304), or return None on a miss.
+    Like get_student_entry, only a token upstream has accepted can hit.
+    """
+    if request.headers.get("Authorization") not in accepted_tokens:
+        return None
+    found = await asyncio.to_thread((store or blob_store).lookup, key)
+    if found is None:
+        return None
+    path, meta = found
+    headers = {**(headers or {}), "ETag": f'"{meta.sha256}"'}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=meta.content_type, headers=headers)
+
+async def remember_blob(key: str, content: bytes, content_type: str, ttl: Optional[float] = None,
+                        store: Optional[BlobStore] = None) -> Optional[BlobMeta]:
+    """Store a downloaded blob; a full or read-only disk must not fail the download."""
+    try:
+        return await asyncio.to_thread((store or blob_store).put, key, content, content_type, ttl)
+    except Exception as e:
+        logger.warning(f"Failed to store blob: {str(e)}")
+        return None
+
+# Generated report / hall ticket PDFs: the slowest upstream call (SSRS render)
+pdf_store = BlobStore(
+    os.environ.get("PDF_CACHE_DIR", "/tmp/edumate-pdfs"),
+    max_bytes=int(os.environ.get("PDF_CACHE_MAX_BYTES", 128 * 1024 * 1024)),
+)
+PDF_CACHE_TTL = int(os.environ.get("PDF_CACHE_TTL", 6 * 3600))
+
+def pdf_key(request: Request, payload: dict) -> str:
+    """
+    Key a generated PDF by (institution, studtblId, reportName, semesterId, hallticketId).
+    Any other report filters are folded in as a digest so they can't collide.
+    """
+    named = ("studtblId", "reportName", "semesterId", "hallticketId")
+    others = {k: v for k, v in payload.items() if k not in named}
+    return BlobStore.make_key(
+        get_institution_id(request),
+        decode_studtbl_id(str(payload.get("studtblId", ""))),
+        payload.get("reportName"),
+        payload.get("semesterId"),
+        payload.get("hallticketId"),
+        hashlib.sha256(json.dumps(others, sort_keys=True, default=str).encode()).hexdigest() if others else "",
+    )
+
+# Downloads are passed through in chunks of this size rather than buffered whole
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 64 * 1024))
+
+async def open_upstream_stream(request: Request, method: str, url: str, **kwargs) -> UpstreamStream:
+    """Start an upstream call and read only its first chunk; the caller owns closing it."""
+    async with get_client(request) as client:
+        return await UpstreamStream.open(client, method, url, chunk_size=STREAM_CHUNK_SIZE, **kwargs)
+
+# Bodies a client stopped reading, still being finished into the blob store
+_store_drains: set = set()
+
+def upstream_length(upstream: UpstreamStream) -> Optional[int]:
+    """Body size from Content-Length, if it counts the bytes that are relayed (not encoded ones)."""
+    if "content-encoding" in upstream.headers:
+        return None
+    try:
+        return int(upstream.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+def parse_byte_range(value: Optional[str], size: Optional[int]) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range against a body of known size.
+
+    Returns:
+        (first, last) inclusive byte positions, or None to serve the whole body
+        (no header, malformed, several ranges, or the size is unknown).
+        first > last means the range is not satisfiable.
+    """
+    if not value or size is None or not value.startswith("bytes=") or "," in value:
+        return None
+    first, sep, last = value[len("bytes="):].strip().partition("-")
+    try:
+        if not sep:
+            return None
+        if not first:
+            # Suffix range: the final N bytes
+            suffix = int(last)
+            return (max(size - suffix, 0) if suffix else size), size - 1
+        first = int(first)
+        last = int(last) if last else None
+    except ValueError:
+        return None
+    if first < 0 or (last is not None and last < first):
+        return None
+    return first, size - 1 if last is None else min(last, size - 1)
+
+async def tee_chunk(writer: Optional[BlobWriter], chunk: bytes) -> Optional[BlobWriter]:
+    """Write a chunk to the store copy; returns None once there is no copy worth finishing."""
+    if writer is None:
+        return None
+    try:
+        await asyncio.to_thread(writer.write, chunk)
+    except Exception as e:
+        logger.warning(f"Failed to store blob: {str(e)}")
+        await asyncio.to_thread(writer.abort)
+    return writer if writer.active else None
+
+async def settle_upstream(upstream: UpstreamStream, chunks, writer: Optional[BlobWriter], exhausted: bool):
+    """
+    Close an upstream body and commit or discard its store copy.
+
+    A body that was cut short (client gone, or only a range was wanted) is read
+    to the end first while a copy is being written, so a retry is served from
+    disk instead of costing another upstream download or render.
+    """
+    try:
+        if writer is not None and not exhausted:
+            async for chunk in chunks:
+                writer = await tee_chunk(writer, chunk)
+                if writer is None:
+                    break
+            else:
+                exhausted = True
+    except Exception as e:
+        logger.warning(f"Failed to store blob: {str(e)}")
+    finally:
+        await upstream.aclose()
+        if writer is not None:
+            try:
+                await asyncio.to_thread(writer.commit if exhausted else writer.abort)
+            except Exception as e:
+                logger.warning(f"Failed to store blob: {str(e)}")
+
+def settle_in_background(upstream: UpstreamStream, chunks, writer: Optional[BlobWriter]):
+    task = asyncio.ensure_future(settle_upstream(upstream, chunks, writer, False))
+    _store_drains.add(task)
+    task.add_done_callback(_store_drains.discard)
+
+async def stream_passthrough(request: Request, upstream: UpstreamStream, media_type: str,
+                             headers: Optional[dict] = None, status_code: Optional[int] = None,
+                             key: Optional[str] = None, ttl: Optional[float] = None,
+                             store: Optional[BlobStore] = None) -> Response:
+    """
+    Relay an upstream body to the client chunk by chunk.
+
+    The next chunk is only read from upstream once the client has taken the
+    previous one, so a download holds about one chunk in memory whatever its
+    size. With key, the body is also written to the blob store as it passes
+    and committed only if it arrived complete.
+
+    A single Range is honoured when upstream sends a Content-Length: only that
+    slice goes to the client (206). A fresh body has no validator yet, so a
+    request carrying If-Range gets the whole body, as RFC 9110 requires.
+    """
+    if key:
+        # Callers only pass a key for a genuine upstream document, so the token was accepted
+        accepted_tokens.add(request.headers.get("Authorization"))
+    status_code = status_code or upstream.status_code
+    size = upstream_length(upstream)
+    headers = dict(headers or {})
+    byte_range = None
+    if status_code == 200:
+        headers["Accept-Ranges"] = "bytes"
+        if "if-range" not in request.headers:
+            byte_range = parse_byte_range(request.headers.get("range"), size)
+
+    writer = None
+    if key:
+        try:
+            writer = await asyncio.to_thread((store or blob_store).writer, key, media_type, ttl)
+        except Exception as e:
+            logger.warning(f"Failed to store blob: {str(e)}")
+    chunks = upstream.iter_bytes()
+
+    if byte_range and byte_range[0] > byte_range[1]:
+        if writer is None:
+            await upstream.aclose()
+        else:
+            settle_in_background(upstream, chunks, writer)
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range:
+        first, last = byte_range
+        status_code = 206
+        headers.update({"Content-Range": f"bytes {first}-{last}/{size}", "Content-Length": str(last - first + 1)})
+    elif size is not None:
+        headers["Content-Length"] = str(size)
+
+    async def body():
+        nonlocal writer
+        exhausted = False
+        position = 0
+        try:
+            async for chunk in chunks:
+                writer = await tee_chunk(writer, chunk)
+                if not byte_range:
+                    yield chunk
+                    continue
+                piece = chunk[max(first - position, 0):last + 1 - position]
+                position += len(chunk)
+                if piece:
+                    yield piece
+                if position > last:
+                    break
+            else:
+                exhausted = True
+        except Exception:
+            # Upstream failed mid-body: whatever was written is incomplete
+            if writer is not None:
+                await asyncio.to_thread(writer.abort)
+                writer = None
+            raise
+        finally:
+            if exhausted or writer is None:
+                await settle_upstream(upstream, chunks, writer, exhausted)
+            else:
+                settle_in_background(upstream, chunks, writer)
+
+    return StreamingResponse(body(), status_code=status_code, media_type=media_type, headers=headers)
+
+def require_logs_key(key: str):
+    """Guard for operational endpoints: the caller must present LOGS_SECRET_KEY."""
+    if not key or not hmac.compare_digest(key, LOGS_SECRET_KEY):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/api/debug/cache")
+async def get_cache_stats(key: str = ""):
+    require_logs_key(key)
+    return {
+        "response_cache": response_cache.stats(),
+        "reference_cache": reference_cache.stats(),
+        "upstream_coalescing": upstream_flight.stats(),
+        "blob_store": blob_store.stats(),
+        "pdf_store": pdf_store.stats(),
+        "prewarm": {**prewarm_stats, "active": len(_prewarm_active)},
+        "compression": {**compression_stats, "variants": compressed_variants.stats()},
+        "rate_limiter": rate_limiter.stats(),
+        "jwt_claims": claims_cache.stats(),
+        "accepted_tokens": accepted_tokens.stats(),
+    }
+
+@app.get("/api/debug/variants")
+async def get_upstream_variants(key: str = ""):
+    require_logs_key(key)
+    return {**upstream_variants.snapshot(), "speculation": {"exam_status": exam_status_fallbacks.stats()}}
+
+@app.get("/api/debug/audit")
+async def get_audit_events(key: str = "", event_type: Optional[str] = None, status: Optional[str] = None,
+                           user_id: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """Recent security events from the in-memory ring buffer, newest first."""
+    require_logs_key(key)
+    return {
+        "events": audit_logger.query(event_type, status, user_id, limit),
+        "stats": audit_logger.stats(),
     }
-    
-    return config["BASE_URL"], headers
 
 
 @app.get("/")
@@ -183,18 +857,12 @@ def _test_seed(studtbl_id: str, inst_id: str) -> int:
     return int(digest[:16], 16)
 
 def _get_test_context(request: Request, requested_studtbl_id: Optional[str] = None):
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return None
-    token = auth_header[7:]
-    try:
-        # NOTE: Used only to detect locally-issued test tokens for mock responses.
-        # Real authorization continues to be enforced by validate_request_authorization().
-        payload = jwt.decode(token, options={"verify_signature": False})
-    except Exception:
-        return None
-    if not payload.get("is_test_user"):
+    # NOTE: Used only to detect locally-issued test tokens for mock responses.
+    # Real authorization continues to be enforced by validate_request_authorization().
+    identity = resolve_identity(request)
+    if not identity.is_test_user:
         return None
+    payload = identity.claims
 
     studtbl_id = str(payload.get("sub") or payload.get("studtblId") or "")
     if not studtbl_id:
@@ -202,7 +870,7 @@ def _get_test_context(request: Request, requested_studtbl_id: Optional[str] = No
     if requested_studtbl_id and studtbl_id != requested_studtbl_id:
         return None
 
-    inst_id = request.headers.get("X-Institution-Id", DEFAULT_INSTITUTION).upper()
+    inst_id = identity.inst_id
     seed = _test_seed(studtbl_id, inst_id)
     rng = random.Random(seed)
 
@@ -449,6 +1117,68 @@ def _get_test_context(request: Request, requested_studtbl_id: Optional[str] = No
     }
     return context
 
+# ============================================================
+#  POST-LOGIN PREWARM (so the first dashboard paint is all cache hits)
+# ============================================================
+PREWARM_CONCURRENCY = int(os.environ.get("PREWARM_CONCURRENCY", 4))    # upstream calls, across all users
+PREWARM_MAX_ACTIVE = int(os.environ.get("PREWARM_MAX_ACTIVE", 16))     # users being prewarmed at once
+PREWARM_COOLDOWN = int(os.environ.get("PREWARM_COOLDOWN", 600))        # seconds between prewarms per user
+PREWARM_DEADLINE = float(os.environ.get("PREWARM_DEADLINE", 20))
+
+prewarm_slots = asyncio.Semaphore(PREWARM_CONCURRENCY)
+_prewarm_last: dict = {}  # user cache key -> monotonic time of last prewarm
+_prewarm_active: set = set()
+prewarm_stats = {"started": 0, "skipped": 0, "sections": 0, "failures": 0, "timeouts": 0}
+
+def request_with_token(request: Request, token: str) -> Request:
+    """A copy of request that authenticates upstream as token, for work done on the user's behalf."""
+    headers = [(k, v) for k, v in request.scope["headers"] if k != b"authorization"]
+    headers.append((b"authorization", f"Bearer {token}".encode()))
+    # A fresh state: the copy must not reuse the original's resolved identity
+    return Request({**request.scope, "headers": headers, "state": {}})
+
+async def prewarm_student_caches(request: Request, studtblId: str):
+    """
+    Fill the response cache with the sections the dashboard loads first.
+
+    Bounded so it never competes with live traffic: at most PREWARM_CONCURRENCY
+    upstream calls and PREWARM_MAX_ACTIVE users at a time, one prewarm per user
+    per PREWARM_COOLDOWN, and PREWARM_DEADLINE seconds in total. Sections that
+    are already cached cost nothing.
+    """
+    user_key = student_cache_key(get_institution_id(request), studtblId, "prewarm")
+    now = time.monotonic()
+    if user_key in _prewarm_active or len(_prewarm_active) >= PREWARM_MAX_ACTIVE \
+            or now - _prewarm_last.get(user_key, -PREWARM_COOLDOWN) < PREWARM_COOLDOWN:
+        prewarm_stats["skipped"] += 1
+        return
+    if len(_prewarm_last) > 10000:
+        _prewarm_last.clear()
+    _prewarm_last[user_key] = now
+    _prewarm_active.add(user_key)
+    prewarm_stats["started"] += 1
+
+    async def warm(load):
+        async with prewarm_slots:
+            try:
+                warmed = isinstance(await load(), CacheEntry)
+            except Exception as e:
+                warmed = False
+            prewarm_stats["sections" if warmed else "failures"] += 1
+
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            warm(lambda: load_dashboard_stats(request, studtblId)),
+            warm(lambda: load_profile_section(request, "academic", studtblId)),
+            warm(lambda: load_profile_section(request, "academic_percentage", studtblId)),
+            warm(lambda: load_profile_section(request, "parent", studtblId)),
+            warm(lambda: load_identifiers(request, studtblId)),
+        ), PREWARM_DEADLINE)
+    except asyncio.TimeoutError:
+        prewarm_stats["timeouts"] += 1
+    finally:
+        _prewarm_active.discard(user_key)
+
 @app.post("/api/login")
 async def login(request: Request, credentials: LoginRequest, background_tasks: BackgroundTasks):
     base_url, base_headers = get_institution_config(request)
@@ -461,7 +1191,7 @@ async def login(request: Request, credentials: LoginRequest, background_tasks: B
     headers = base_headers.copy()
     headers["Referer"] = f"{base_headers['Origin']}/sign-in"
 
-    client_ip = request.client.host if request.client else "Unknown"
+    client_ip = resolve_identity(request).client_ip
     
     async with get_client(request) as client:
         try:
@@ -475,9 +1205,18 @@ async def login(request: Request, credentials: LoginRequest, background_tasks: B
                 try:
                     # Update headers with the new token
                     headers["Authorization"] = f"Bearer {data.get('idToken')}"
-                    pers_resp = await client.get(f"{base_url}/Student/GetStudentPersonalDetails", params={"studtblId": data.get("userId")}, headers=headers)
+                    pers_resp = await upstream_get(client, f"{base_url}/Student/GetStudentPersonalDetails", params={"studtblId": data.get("userId")}, headers=headers)
                     if pers_resp.status_code == 200:
                         p_data = pers_resp.json()
+                        # The dashboard asks for the same personal details seconds from now
+                        personal = _normalize_personal(p_data) if isinstance(p_data, dict) else None
+                        # Seed only real details, as load_profile_section does: never an error result
+                        if personal is not None and "error" not in personal and data.get("userId"):
+                            # The token came from the ERP's own login response
+                            accepted_tokens.add(headers["Authorization"])
+                            await response_cache.set(
+                                student_cache_key(get_institution_id(request), data["userId"], "personal"),
+                                encode_json(personal), PROFILE_CACHE_TTLS["personal"])
                         # Some APIs return {"data": {"studentName": ...}}, others return {"studentName": ...}
                         inner_data = p_data.get("data") if isinstance(p_data, dict) else {}
                         if isinstance(p_data, list) and len(p_data) > 0:
@@ -492,6 +1231,9 @@ async def login(request: Request, credentials: LoginRequest, background_tasks: B
                 except Exception as e:
                     student_name = data.get("name", "Unknown")
 
+                if data.get("idToken") and data.get("userId"):
+                    background_tasks.add_task(prewarm_student_caches, request_with_token(request, data["idToken"]), data["userId"])
+
                 # Log success
                 if sheets_logger:
                     user_details = {
@@ -521,7 +1263,7 @@ async def login(request: Request, credentials: LoginRequest, background_tasks: B
             pass
     # Fallback Mock for Dev
     if credentials.username == "test" and credentials.password == "test":
-        inst_id = request.headers.get("X-Institution-Id", DEFAULT_INSTITUTION).upper()
+        inst_id = get_institution_id(request)
         mock_raw_id = f"{inst_id}TEST{int(time.time())}"
         mock_studtbl_id = base64.b64encode(mock_raw_id.encode()).decode()
         mock_seed = _test_seed(mock_studtbl_id, inst_id)
@@ -612,20 +1354,28 @@ async def get_profile_image(request: Request, studtblId: str, documentId: str =
     # SECURITY: Validate user owns this resource
     await validate_request_authorization(request, studtblId, "/api/profile/image")
 
+    key = blob_key(request, studtblId, documentId)
+    stored = await serve_stored_blob(request, key)
+    if stored:
+        return stored
+
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/Document/DownloadBlob"
     
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"documentId": documentId, "studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"documentId": documentId, "studtblId": studtblId}, headers=headers)
             
             if resp.status_code == 200:
+                accepted_tokens.add(headers["Authorization"])
                 content_type = resp.headers.get("content-type", "image/jpeg")
+                meta = await remember_blob(key, resp.content, content_type)
                 return Response(
                     content=resp.content,
                     media_type=content_type,
-                    status_code=200
+                    status_code=200,
+                    headers={"ETag": f'"{meta.sha256}"'} if meta else None
                 )
             else:
                 pass
@@ -637,9 +1387,13 @@ async def get_profile_image(request: Request, studtblId: str, documentId: str =
 # ============================================================
 #  DASHBOARD STATS
 # ============================================================
-# ============================================================
-#  DASHBOARD STATS
-# ============================================================
+# Stats are served from memory for STATS_SOFT_TTL, then stale-while-revalidate
+# for STATS_REVALIDATE_WINDOW, and kept as a stale-if-error fallback until STATS_HARD_TTL.
+STATS_SOFT_TTL = int(os.environ.get("STATS_SOFT_TTL", 300))
+STATS_REVALIDATE_WINDOW = int(os.environ.get("STATS_REVALIDATE_WINDOW", 1800))
+STATS_HARD_TTL = int(os.environ.get("STATS_HARD_TTL", 86400))
+stats_recompute = RunningAverage(initial=1.0)
+
 @app.get("/api/dashboard/stats")
 async def get_dashboard_stats(request: Request, studtblId: str):
     studtblId = fix_id(studtblId)
@@ -650,52 +1404,86 @@ async def get_dashboard_stats(request: Request, studtblId: str):
     if test_ctx:
         return test_ctx["stats"]
 
+    entry = await load_dashboard_stats(request, studtblId)
+    if entry is None:
+        return {"error": "Failed to fetch dashboard data"}
+    return cached_json_response(request, entry)
+
+async def load_dashboard_stats(request: Request, studtblId: str) -> Optional[CacheEntry]:
+    """
+    Dashboard stats from the response cache, revalidated in the background once stale.
+    Returns None only when upstream fails and no copy within the hard TTL exists.
+    """
     base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Dashboard/GetStudentDashboardDetails"
-    
+    client = request.app.state.client
+    key = student_cache_key(get_institution_id(request), studtblId, "stats")
+
+    async def fetch() -> Optional[CacheEntry]:
+        started = time.monotonic()
+        stats = await fetch_dashboard_stats(client, base_url, headers, studtblId)
+        stats_recompute.observe(time.monotonic() - started)
+        if stats is None:
+            return None
+        return await response_cache.set(key, encode_json(stats), STATS_HARD_TTL)
+
+    # Also the stale-if-error fallback, so never read for a token upstream hasn't accepted
+    entry = await get_student_entry(request, key)
+    if entry is not None:
+        age = time.time() - entry.stored_at
+        if not should_revalidate(entry, STATS_SOFT_TTL, stats_recompute.value):
+            return entry
+        if age < STATS_SOFT_TTL + STATS_REVALIDATE_WINDOW:
+            # Stale-while-revalidate: answer from memory, refresh behind the response
+            schedule_refresh(key, fetch)
+            return entry
+
+    # Stale-if-error: if upstream fails, the copy is still within its hard TTL
+    return await fetch() or entry
+
+def _normalize_dashboard_stats(json_data) -> dict:
+    stats = {
+        "attendance_percentage": 0,
+        "cgpa": 0.0,
+        "arrears": 0,
+        "od_percentage": 0,
+        "od_count": 0,
+        "absent_percentage": 0,
+        "program": "",
+        "branch_code": "",
+        "mentor_name": "",
+        "total_semesters": 0,
+        "total_years": 0
+    }
+
+    if "data" in json_data and isinstance(json_data["data"], list) and len(json_data["data"]) > 0:
+        raw = json_data["data"][0]
+        stats = {
+            "attendance_percentage": raw.get("attendancePercentage", 0),
+            "cgpa": raw.get("uG_Cgpa", 0.0),
+            "arrears": 0,  # Will be filled from exam-status
+            "od_percentage": raw.get("odPercentage", 0),
+            "od_count": raw.get("odCount", 0),
+            "absent_percentage": raw.get("absentPercentage", 0),
+            "program": raw.get("program", ""),
+            "branch_code": raw.get("branchCode", ""),
+            "mentor_name": raw.get("mentorName", ""),
+            "total_semesters": raw.get("totalSemesters", 0),
+            "total_years": raw.get("totalYears", 0),
+            "pgpa": raw.get("pG_Cgpa", 0.0) # Updated key per user feedback
+        }
+    return stats
+
+async def fetch_dashboard_stats(client: httpx.AsyncClient, base_url: str, headers: dict, studtblId: str) -> Optional[dict]:
+    """Fetch normalized dashboard stats, or None if upstream failed. Safe to run after the request ended."""
     try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
-            
-            if resp.status_code == 200:
-                json_data = resp.json()
-                stats = {
-                    "attendance_percentage": 0,
-                    "cgpa": 0.0,
-                    "arrears": 0,
-                    "od_percentage": 0,
-                    "od_count": 0,
-                    "absent_percentage": 0,
-                    "program": "",
-                    "branch_code": "",
-                    "mentor_name": "",
-                    "total_semesters": 0,
-                    "total_years": 0
-                }
-                
-                if "data" in json_data and isinstance(json_data["data"], list) and len(json_data["data"]) > 0:
-                    raw = json_data["data"][0]
-                    stats = {
-                        "attendance_percentage": raw.get("attendancePercentage", 0),
-                        "cgpa": raw.get("uG_Cgpa", 0.0),
-                        "arrears": 0,  # Will be filled from exam-status
-                        "od_percentage": raw.get("odPercentage", 0),
-                        "od_count": raw.get("odCount", 0),
-                        "absent_percentage": raw.get("absentPercentage", 0),
-                        "program": raw.get("program", ""),
-                        "branch_code": raw.get("branchCode", ""),
-                        "mentor_name": raw.get("mentorName", ""),
-                        "total_semesters": raw.get("totalSemesters", 0),
-                        "total_years": raw.get("totalYears", 0),
-                        "pgpa": raw.get("pG_Cgpa", 0.0) # Updated key per user feedback
-                    }
-                return stats
-            else:
-                pass
+        resp = await upstream_get(client, f"{base_url}/Dashboard/GetStudentDashboardDetails", params={"studtblId": studtblId}, headers=headers)
+        if resp.status_code == 200:
+            stats = _normalize_dashboard_stats(resp.json())
+            accepted_tokens.add(headers["Authorization"])
+            return stats
     except Exception as e:
         pass
-        
-    return {"error": "Failed to fetch dashboard data"}
+    return None
 
 # ============================================================
 #  ACADEMIC DETAILS (sem, branch, hostel, etc.)
@@ -710,40 +1498,31 @@ async def get_academic_details(request: Request, studtblId: str):
     if test_ctx:
         return test_ctx["academic"]
 
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Student/GetStudentAcademicDetails"
-    
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
-            
-            if resp.status_code == 200:
-                json_data = resp.json()
-                if "data" in json_data and isinstance(json_data["data"], list) and len(json_data["data"]) > 0:
-                    raw = json_data["data"][0]
-                    return {
-                        "dept": raw.get("studentDepartment") or raw.get("programName", ""),
-                        "semester": raw.get("currentSemsterId") or raw.get("semesterNo", 0),
-                        "semester_name": raw.get("semesterName", ""),
-                        "semester_type": raw.get("semesterType", ""),
-                        "section": raw.get("sectionName", ""), # Not always available in this endpoint
-                        "batch": raw.get("academicBatchYear") or raw.get("batchName", ""),
-                        "admission_mode": raw.get("admissionMode", ""),
-                        "university_reg_no": raw.get("universityRegNo") or raw.get("universityRegisterNo", ""),
-                        "mentor_name": raw.get("mentorName", ""),
-                        "hostel": raw.get("hostel") or raw.get("isHosteller", False),
-                        "bus_code": raw.get("busCode") or raw.get("busRouteCode", ""),
-                        "current_academic_year": raw.get("currentAcademicYear") or raw.get("academicYear", ""),
-                        # Raw IDs for other API calls
-                        "branch_id": raw.get("branchId"),
-                        "year_of_study_id": raw.get("yearOfStudyId"),
-                        "section_id": raw.get("sectionId"),
-                        "academic_year_id": raw.get("academicYearId")
-                    }
-    except Exception as e:
-        pass
+    return await get_cached_profile_section(request, "academic", studtblId)
 
-    return {"error": "Failed to fetch academic details"}
+def _normalize_academic(json_data) -> Optional[dict]:
+    if "data" in json_data and isinstance(json_data["data"], list) and len(json_data["data"]) > 0:
+        raw = json_data["data"][0]
+        return {
+            "dept": raw.get("studentDepartment") or raw.get("programName", ""),
+            "semester": raw.get("currentSemsterId") or raw.get("semesterNo", 0),
+            "semester_name": raw.get("semesterName", ""),
+            "semester_type": raw.get("semesterType", ""),
+            "section": raw.get("sectionName", ""), # Not always available in this endpoint
+            "batch": raw.get("academicBatchYear") or raw.get("batchName", ""),
+            "admission_mode": raw.get("admissionMode", ""),
+            "university_reg_no": raw.get("universityRegNo") or raw.get("universityRegisterNo", ""),
+            "mentor_name": raw.get("mentorName", ""),
+            "hostel": raw.get("hostel") or raw.get("isHosteller", False),
+            "bus_code": raw.get("busCode") or raw.get("busRouteCode", ""),
+            "current_academic_year": raw.get("currentAcademicYear") or raw.get("academicYear", ""),
+            # Raw IDs for other API calls
+            "branch_id": raw.get("branchId"),
+            "year_of_study_id": raw.get("yearOfStudyId"),
+            "section_id": raw.get("sectionId"),
+            "academic_year_id": raw.get("academicYearId")
+        }
+    return None
 
 # ============================================================
 #  PERSONAL DETAILS
@@ -761,42 +1540,33 @@ async def get_personal_details(request: Request, studtblId: str):
     if test_ctx:
         return test_ctx["personal"]
 
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Student/GetStudentPersonalDetails"
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
-            if resp.status_code == 200:
-                json_data = resp.json()
-                if "data" in json_data and json_data["data"]:
-                    raw = json_data["data"]
-                    # Handle cases where data is a list (sometimes happens)
-                    if isinstance(raw, list) and len(raw) > 0:
-                        raw = raw[0]
-                    elif isinstance(raw, list):
-                        return {"error": "Invalid data format"}
+    return await get_cached_profile_section(request, "personal", studtblId)
 
-                    return {
-                        "name": raw.get("studentName", ""),
-                        "reg_no": raw.get("studRollNo", ""),
-                        "photo_id": raw.get("photoDocumentId", ""),
-                        "email": raw.get("officialEmailid", ""),
-                        "date_of_birth": raw.get("dateOfBirth", ""),
-                        "gender": raw.get("gender", ""),
-                        "community": raw.get("community", ""),
-                        "religion": raw.get("religion", ""),
-                        "mobile": raw.get("mobileNo", ""),
-                        "bus_route": raw.get("busRoute", ""),
-                        "hostel": raw.get("isHostel", False),
-                        "languages": raw.get("languageKnown", ""),
-                        "age": raw.get("currentAge", "")
-                    }
-            else:
-                pass
-    except Exception as e:
-        pass
+def _normalize_personal(json_data) -> Optional[dict]:
+    if "data" in json_data and json_data["data"]:
+        raw = json_data["data"]
+        # Handle cases where data is a list (sometimes happens)
+        if isinstance(raw, list) and len(raw) > 0:
+            raw = raw[0]
+        elif isinstance(raw, list):
+            return {"error": "Invalid data format"}
 
-    return {"error": "Failed to fetch personal details"}
+        return {
+            "name": raw.get("studentName", ""),
+            "reg_no": raw.get("studRollNo", ""),
+            "photo_id": raw.get("photoDocumentId", ""),
+            "email": raw.get("officialEmailid", ""),
+            "date_of_birth": raw.get("dateOfBirth", ""),
+            "gender": raw.get("gender", ""),
+            "community": raw.get("community", ""),
+            "religion": raw.get("religion", ""),
+            "mobile": raw.get("mobileNo", ""),
+            "bus_route": raw.get("busRoute", ""),
+            "hostel": raw.get("isHostel", False),
+            "languages": raw.get("languageKnown", ""),
+            "age": raw.get("currentAge", "")
+        }
+    return None
 
 # ============================================================
 #  EXAM STATUS (for arrears / eligibility)
@@ -817,6 +1587,12 @@ async def get_exam_status(request: Request, studtblId: str,
     if test_ctx:
         return test_ctx["exam_status"]
 
+    return await fetch_exam_status(request, studtblId, academicYearId, yearOfStudyId,
+                                   semesterId, branchId, sectionId, semesterType)
+
+async def fetch_exam_status(request: Request, studtblId: str, academicYearId: int, yearOfStudyId: int,
+                            semesterId: int, branchId: int, sectionId: int, semesterType: str) -> dict:
+    """Normalized exam eligibility, falling back to the previous semester for arrear counts."""
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/HallTicket/GetStudentExamStatus"
     params = {
@@ -828,10 +1604,21 @@ async def get_exam_status(request: Request, studtblId: str,
         "SectionId": sectionId,
         "presemesterType": semesterType
     }
-    
+    # Previous semester, for arrear counts the current one doesn't report yet
+    prev_params = {**params, "SemesterId": semesterId - 1,
+                   "presemesterType": "Odd" if semesterType == "Even" else "Even"}
+
+    # When this (institution, semester) usually needs the fallback, request both
+    # semesters at once. Direct call (not coalesced) so it can be cancelled if unused.
+    speculation_key = (get_institution_id(request), semesterId)
+    speculative = None
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            if semesterId > 1 and exam_status_fallbacks.should_speculate(speculation_key):
+                speculative = asyncio.ensure_future(client.get(upstream_url, params=prev_params, headers=headers))
+                speculative.add_done_callback(lambda t: t.cancelled() or t.exception())  # an unused failure is not an error
+
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             
             if resp.status_code == 200:
                 json_data = resp.json()
@@ -842,15 +1629,15 @@ async def get_exam_status(request: Request, studtblId: str,
                 
                 # Check if we have arrears data. If not, and we are not in Sem 1, try previous semester.
                 has_arrear_info = raw.get("historyOfArrears") is not None or raw.get("totalArrears") is not None
+                needs_previous = not has_arrear_info and semesterId > 1
+                if semesterId > 1:
+                    exam_status_fallbacks.observe(speculation_key, needs_previous, speculative is not None)
                 
-                if not has_arrear_info and semesterId > 1:
-                    # Determine previous sem type
-                    prev_sem_type = "Odd" if semesterType == "Even" else "Even"
-                    params["SemesterId"] = semesterId - 1
-                    params["presemesterType"] = prev_sem_type
-                    
-                    # Retry fetch
-                    resp_prev = await client.get(upstream_url, params=params, headers=headers)
+                if needs_previous:
+                    if speculative is not None:
+                        resp_prev = await speculative
+                    else:
+                        resp_prev = await upstream_get(client, upstream_url, params=prev_params, headers=headers)
                     if resp_prev.status_code == 200:
                         json_prev = resp_prev.json()
                         if "data" in json_prev and json_prev["data"]:
@@ -877,6 +1664,9 @@ async def get_exam_status(request: Request, studtblId: str,
                 }
     except Exception as e:
         pass
+    finally:
+        if speculative is not None and not speculative.done():
+            speculative.cancel()
     
     return {"error": "Failed to fetch exam status"}
 
@@ -904,6 +1694,13 @@ async def get_arrears_details(
         arrears = test_ctx["arrears"]
         return {"success": True, "count": len(arrears), "data": arrears}
 
+    return await fetch_arrears(request, studtblId, academicYearId, branchId, yearOfStudyId,
+                               semesterId, sectionId, programmeId, semesterType)
+
+async def fetch_arrears(request: Request, studtblId: str, academicYearId: int, branchId: int,
+                        yearOfStudyId: int, semesterId: int, sectionId: int, programmeId: int,
+                        semesterType: str) -> dict:
+    """Subjects the student is registered for as arrears this semester."""
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/HallTicket/GetHallticketSubjectDetails"
     
@@ -920,7 +1717,7 @@ async def get_arrears_details(
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=upstream_params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=upstream_params, headers=headers)
             if resp.status_code == 200:
                 json_data = resp.json()
                 if "data" in json_data and isinstance(json_data["data"], list):
@@ -949,30 +1746,21 @@ async def get_academic_percentage(request: Request, studtblId: str):
     if test_ctx:
         return test_ctx["academic_percentage"]
 
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Student/GetStudentAcademicPercentage"
-    
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
-            
-            if resp.status_code == 200:
-                json_data = resp.json()
-                if "data" in json_data and isinstance(json_data["data"], list):
-                    return {
-                        "records": [
-                            {
-                                "exam": item.get("qualifiedExam", ""),
-                                "year": item.get("yearOfPassing", ""),
-                                "percentage": item.get("aPercentage", "0")
-                            }
-                            for item in json_data["data"]
-                        ]
-                    }
-    except Exception as e:
-        pass
-    
-    return {"error": "Failed to fetch academic percentage"}
+    return await get_cached_profile_section(request, "academic_percentage", studtblId)
+
+def _normalize_academic_percentage(json_data) -> Optional[dict]:
+    if "data" in json_data and isinstance(json_data["data"], list):
+        return {
+            "records": [
+                {
+                    "exam": item.get("qualifiedExam", ""),
+                    "year": item.get("yearOfPassing", ""),
+                    "percentage": item.get("aPercentage", "0")
+                }
+                for item in json_data["data"]
+            ]
+        }
+    return None
 
 # ============================================================
 #  PARENT DETAILS
@@ -987,31 +1775,69 @@ async def get_parent_details(request: Request, studtblId: str):
     if test_ctx:
         return test_ctx["parent"]
 
+    return await get_cached_profile_section(request, "parent", studtblId)
+
+def _normalize_parent(json_data) -> Optional[dict]:
+    if "data" in json_data and json_data["data"]:
+        raw = json_data["data"]
+        return {
+            "father_name": raw.get("fatherName", ""),
+            "father_occupation": raw.get("fatherOccupation", ""),
+            "father_mobile": raw.get("fatherMobileNo", ""),
+            "mother_name": raw.get("motherName", ""),
+            "mother_occupation": raw.get("motherOccupation", ""),
+            "mother_mobile": raw.get("motherMobileNo", ""),
+            "guardian_name": raw.get("guardianName", ""),
+            "guardian_occupation": raw.get("guardianOccupation", ""),
+            "guardian_mobile": raw.get("guardianMobileNo", "")
+        }
+    return None
+
+# Upstream endpoint, normalizer and error message for each cached profile section
+PROFILE_SECTIONS = {
+    "academic": ("Student/GetStudentAcademicDetails", _normalize_academic, "Failed to fetch academic details"),
+    "personal": ("Student/GetStudentPersonalDetails", _normalize_personal, "Failed to fetch personal details"),
+    "academic_percentage": ("Student/GetStudentAcademicPercentage", _normalize_academic_percentage, "Failed to fetch academic percentage"),
+    "parent": ("Student/GetStudentParentDetails", _normalize_parent, "Failed to fetch parent details"),
+}
+
+async def fetch_profile_section(request: Request, section: str, studtblId: str) -> dict:
+    """Fetch and normalize a profile section from upstream, returning an error dict on failure."""
+    upstream_path, normalize, error_message = PROFILE_SECTIONS[section]
     base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Student/GetStudentParentDetails"
-    
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, f"{base_url}/{upstream_path}", params={"studtblId": studtblId}, headers=headers)
             if resp.status_code == 200:
-                json_data = resp.json()
-                if "data" in json_data and json_data["data"]:
-                    raw = json_data["data"]
-                    return {
-                        "father_name": raw.get("fatherName", ""),
-                        "father_occupation": raw.get("fatherOccupation", ""),
-                        "father_mobile": raw.get("fatherMobileNo", ""),
-                        "mother_name": raw.get("motherName", ""),
-                        "mother_occupation": raw.get("motherOccupation", ""),
-                        "mother_mobile": raw.get("motherMobileNo", ""),
-                        "guardian_name": raw.get("guardianName", ""),
-                        "guardian_occupation": raw.get("guardianOccupation", ""),
-                        "guardian_mobile": raw.get("guardianMobileNo", "")
-                    }
+                data = normalize(resp.json())
+                if data is not None:
+                    accepted_tokens.add(headers["Authorization"])
+                    return data
     except Exception as e:
         pass
-    
-    return {"error": "Failed to fetch parent details"}
+    return {"error": error_message}
+
+async def load_profile_section(request: Request, section: str, studtblId: str) -> Optional[CacheEntry]:
+    """Profile section from the response cache, fetched on a miss. None if upstream fails."""
+    key = student_cache_key(get_institution_id(request), studtblId, section)
+    entry = await get_student_entry(request, key)
+    if entry is not None:
+        return entry
+
+    data = await fetch_profile_section(request, section, studtblId)
+    if "error" in data:
+        return None
+    return await response_cache.set(key, encode_json(data), PROFILE_CACHE_TTLS[section])
+
+async def get_cached_profile_section(request: Request, section: str, studtblId: str):
+    """
+    Serve a profile section from the response cache, fetching it on a miss.
+    A hit skips both the upstream round-trip and the JSON encode.
+    """
+    entry = await load_profile_section(request, section, studtblId)
+    if entry is None:
+        return {"error": PROFILE_SECTIONS[section][2]}
+    return cached_json_response(request, entry)
 
 # ============================================================
 #  HALLTICKET
@@ -1027,17 +1853,31 @@ async def get_hallticket_history(request: Request, studtblId: str, searchTerm: s
     if test_ctx:
         return {"success": True, "data": test_ctx["hallticket"]["history"]}
 
+    entry = await load_hallticket_history(request, studtblId, searchTerm)
+    if entry is None:
+        return {"error": "Failed to fetch hallticket history"}
+    return cached_json_response(request, entry)
+
+async def load_hallticket_history(request: Request, studtblId: str, searchTerm: str = "") -> Optional[CacheEntry]:
+    # Closed hall tickets never change; new ones appear at most once a semester
+    key = student_cache_key(get_institution_id(request), studtblId, f"hallticket_history:{searchTerm}")
+    entry = await get_student_entry(request, key)
+    if entry is not None:
+        return entry
+
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/HallTicket/GetHallTicketHistoryByStudent"
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId, "SearchTerm": searchTerm}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId, "SearchTerm": searchTerm}, headers=headers)
             if resp.status_code == 200:
-                return resp.json()
+                resp.json()  # Only cache well-formed JSON
+                accepted_tokens.add(headers["Authorization"])
+                return await response_cache.set(key, resp.content, policy(SLOW_CHANGING).server_ttl)
     except Exception as e:
         pass
-    return {"error": "Failed to fetch hallticket history"}
+    return None
 
 
 @app.get("/api/hallticket/subject-details")
@@ -1060,6 +1900,12 @@ async def get_hallticket_subject_details(
     if test_ctx:
         return {"success": True, "data": test_ctx["hallticket"]["subjects"]}
 
+    return await fetch_hallticket_subject_details(request, studtblId, academicYearId, branchId, yearOfStudyId,
+                                                  semesterId, sectionId, programmeId, semesterType)
+
+async def fetch_hallticket_subject_details(request: Request, studtblId: str, academicYearId: int, branchId: int,
+                                           yearOfStudyId: int, semesterId: int, sectionId: int, programmeId: int,
+                                           semesterType: str):
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/HallTicket/GetHallticketSubjectDetails"
     
@@ -1070,7 +1916,7 @@ async def get_hallticket_subject_details(
     }
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch subject details"}
@@ -1095,7 +1941,7 @@ async def get_hallticket_student_mentor_subjects(
     }
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch mentor subjects"}
@@ -1120,7 +1966,7 @@ async def get_hallticket_selected_subject(
     }
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch selected subjects"}
@@ -1131,14 +1977,7 @@ async def get_hallticket_notes(request: Request, category: str = "hallticket"):
     test_ctx = _get_test_context(request)
     if test_ctx:
         return {"success": True, "data": test_ctx["hallticket"]["notes"]}
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/HallTicket/GetGlobalStaticNotesByCategory"
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"Category": category}, headers=headers)
-            if resp.status_code == 200: return resp.json()
-    except Exception as e: pass
-    return {"error": "Failed to fetch notes"}
+    return await get_reference_data(request, "HallTicket/GetGlobalStaticNotesByCategory", {"Category": category}, "Failed to fetch notes")
 
 
 @app.get("/api/hallticket/academic-year-sem")
@@ -1146,14 +1985,7 @@ async def get_hallticket_academic_year_sem(request: Request, programmeId: int =
     test_ctx = _get_test_context(request)
     if test_ctx:
         return {"success": True, "data": test_ctx["hallticket"]["academic_year_sem"]}
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/HallTicket/GetAcademicYearAndSemesterType"
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"programmeId": programmeId}, headers=headers)
-            if resp.status_code == 200: return resp.json()
-    except Exception as e: pass
-    return {"error": "Failed to fetch academic year and sem"}
+    return await get_reference_data(request, "HallTicket/GetAcademicYearAndSemesterType", {"programmeId": programmeId}, "Failed to fetch academic year and sem")
 
 
 @app.get("/api/hallticket/download-status")
@@ -1169,6 +2001,10 @@ async def get_hallticket_download_status(
     if test_ctx:
         return test_ctx["hallticket"]["download_status"]
 
+    return await fetch_hallticket_download_status(request, studtblId, semesterId, semesterType, academicYearId)
+
+async def fetch_hallticket_download_status(request: Request, studtblId: str, semesterId: int,
+                                           semesterType: str, academicYearId: int):
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/HallTicket/GetDownloadHallTicketsByFeesPaid"
     params = {
@@ -1177,11 +2013,68 @@ async def get_hallticket_download_status(
     }
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch download status"}
 
+# ============================================================
+#  HALLTICKET BUNDLE (the hall ticket view in one round-trip)
+# ============================================================
+HALLTICKET_BUNDLE_DEADLINE = float(os.environ.get("HALLTICKET_BUNDLE_DEADLINE", 12))
+
+@app.get("/api/hallticket/bundle")
+async def get_hallticket_bundle(
+    request: Request,
+    studtblId: str,
+    academicYearId: int = 14,
+    branchId: int = 2,
+    yearOfStudyId: int = 3,
+    semesterId: int = 6,
+    sectionId: int = 2,
+    programmeId: int = 1,
+    semesterType: str = "Even",
+    category: str = "hallticket",
+    stream: Optional[str] = Query(None, pattern="^(ndjson|sse)$")
+):
+    """
+    History, subject details, download status, notes, course attendance and
+    dashboard stats in one response, loaded concurrently under
+    HALLTICKET_BUNDLE_DEADLINE seconds. Notes come from the institution-wide
+    reference cache; history and stats from the response cache.
+    ?stream=ndjson|sse sends each section as soon as it is ready.
+    """
+    studtblId = fix_id(studtblId)
+
+    # SECURITY: Validate user owns this resource
+    await validate_request_authorization(request, studtblId, "/api/hallticket/bundle")
+    test_ctx = _get_test_context(request, studtblId)
+    if test_ctx:
+        hallticket = test_ctx["hallticket"]
+        return await run_sections({
+            "history": static_section({"success": True, "data": hallticket["history"]}),
+            "subjects": static_section({"success": True, "data": hallticket["subjects"]}),
+            "download_status": static_section(hallticket["download_status"]),
+            "notes": static_section({"success": True, "data": hallticket["notes"]}),
+            "course": static_section({"success": True, "data": test_ctx["attendance"]["course"]}),
+            "stats": static_section(test_ctx["stats"]),
+        }, HALLTICKET_BUNDLE_DEADLINE, stream)
+
+    attendance_params = build_attendance_params(request)
+    attendance_params["studtblId"] = studtblId
+
+    return await run_sections({
+        "history": lambda: load_hallticket_history(request, studtblId),
+        "subjects": lambda: fetch_hallticket_subject_details(
+            request, studtblId, academicYearId, branchId, yearOfStudyId,
+            semesterId, sectionId, programmeId, semesterType),
+        "download_status": lambda: fetch_hallticket_download_status(
+            request, studtblId, semesterId, semesterType, academicYearId),
+        "notes": lambda: load_reference_data(request, "HallTicket/GetGlobalStaticNotesByCategory", {"Category": category}),
+        "course": lambda: fetch_attendance_course_detail(request, attendance_params),
+        "stats": lambda: load_dashboard_stats(request, studtblId),
+    }, HALLTICKET_BUNDLE_DEADLINE, stream)
+
 class HallTicketDownloadRequest(BaseModel):
     reportName: str
     studtblId: str
@@ -1208,20 +2101,26 @@ async def download_hallticket_pdf(request: Request, payload: HallTicketDownloadR
         "semesterId": payload.semesterId,
         "hallticketId": payload.hallticketId
     }
+
+    # SECURITY: Cached PDFs are keyed by studtblId, so ownership must be checked before serving one
+    await validate_request_authorization(request, payload.studtblId, "/api/hallticket/download-pdf")
+    disposition = {"Content-Disposition": "attachment; filename=HallTicket.pdf"}
+    key = pdf_key(request, upstream_payload)
+    stored = await serve_stored_blob(request, key, disposition, store=pdf_store)
+    if stored:
+        return stored
     
     try:
-        async with get_client(request) as client:
-            resp = await client.post(upstream_url, json=upstream_payload, headers=headers)
-            content_type = resp.headers.get("content-type", "application/pdf")
-            return StreamingResponse(
-                content=iter([resp.content]),
-                status_code=resp.status_code,
-                media_type=content_type,
-                headers={"Content-Disposition": "attachment; filename=HallTicket.pdf"}
-            )
+        upstream = await open_upstream_stream(request, "POST", upstream_url, json=upstream_payload, headers=headers)
     except Exception as e:
         return {"error": str(e)}
 
+    content_type = upstream.headers.get("content-type", "application/pdf")
+    if upstream.status_code == 200 and upstream.first[:5] == b'%PDF-':
+        return await stream_passthrough(request, upstream, "application/pdf", disposition,
+                                        key=key, ttl=PDF_CACHE_TTL, store=pdf_store)
+    return await stream_passthrough(request, upstream, content_type, disposition)
+
 # ============================================================
 #  DOCUMENT UPLOAD
 # ============================================================
@@ -1241,7 +2140,7 @@ async def get_document_status(request: Request, studtblId: str):
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId}, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch document status"}
@@ -1261,7 +2160,7 @@ async def get_other_documents(request: Request, studtblId: str, ocrStatus: str =
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId, "ocrStatus": ocrStatus}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId, "ocrStatus": ocrStatus}, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch other documents"}
@@ -1278,22 +2177,14 @@ async def get_endorsement_list(request: Request, studtblId: str):
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId}, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch endorsement list"}
 
 @app.get("/api/document/professional-course-list")
 async def get_professional_course_list(request: Request, endorsementId: int = 1):
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Endorsement/GetProfessionalCourseList"
-    
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"endorsementId": endorsementId}, headers=headers)
-            if resp.status_code == 200: return resp.json()
-    except Exception as e: pass
-    return {"error": "Failed to fetch professional course list"}
+    return await get_reference_data(request, "Endorsement/GetProfessionalCourseList", {"endorsementId": endorsementId}, "Failed to fetch professional course list")
 
 @app.get("/api/document/endorsement-certificates")
 async def get_endorsement_certificates(request: Request, studtblId: str, endorsementId: int = 1, searchText: str = ""):
@@ -1307,7 +2198,7 @@ async def get_endorsement_certificates(request: Request, studtblId: str, endorse
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId, "endorsementId": endorsementId, "searchText": searchText}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId, "endorsementId": endorsementId, "searchText": searchText}, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch endorsement certificates"}
@@ -1324,7 +2215,7 @@ async def get_endorsement_courses(request: Request, studtblId: str, professional
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId, "professionalCourseId": professionalCourseId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId, "professionalCourseId": professionalCourseId}, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch endorsement courses"}
@@ -1340,41 +2231,34 @@ async def download_document_blob(request: Request, studtblId: str, documentId: s
     if test_ctx:
         return StreamingResponse(iter([b"Mock document content for test user"]), media_type="application/pdf")
 
+    # Documents are addressed by id and never change once uploaded
+    cache_headers = {"Cache-Control": classify_by_guid(documentId).cache_control}
+    key = blob_key(request, studtblId, documentId)
+    stored = await serve_stored_blob(request, key, cache_headers)
+    if stored:
+        return stored
+
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/Document/DownloadBlob"
     
     # We'll stream the binary reaction directly to the client
-    from fastapi.responses import StreamingResponse
     try:
-        async with get_client(request) as client:
-            # We use stream() to efficiently pass through binary data like PDFs or Images
-            response = await client.get(upstream_url, params={"documentId": documentId, "studtblId": studtblId}, headers=headers)
-            
-            def iterfile():
-                yield response.content
-            
-            # Forward the exact content type from the upstream API
-            content_type = response.headers.get("Content-Type", "application/octet-stream")
-            return StreamingResponse(iterfile(), media_type=content_type)
-    except Exception as e: pass
-    return {"error": "Failed to download blob"}
+        upstream = await open_upstream_stream(request, "GET", upstream_url, params={"documentId": documentId, "studtblId": studtblId}, headers=headers)
+    except Exception as e:
+        return {"error": "Failed to download blob"}
+
+    # Forward the exact content type from the upstream API; a complete body is
+    # kept on disk, where later requests get it with an ETag
+    content_type = upstream.headers.get("Content-Type", "application/octet-stream")
+    if upstream.status_code == 200:
+        return await stream_passthrough(request, upstream, content_type, cache_headers, key=key)
+    return await stream_passthrough(request, upstream, content_type, status_code=200)
 # ============================================================
 #  REPORT MENU (available report types)
 # ============================================================
 @app.get("/api/reports/menu")
 async def get_report_menu(request: Request):
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Report/GetReportMenuWithSubCategories"
-    
-    try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, headers=headers)
-            if resp.status_code == 200:
-                return resp.json()
-    except Exception as e:
-        pass
-    
-    return {"error": "Failed to fetch report menu"}
+    return await get_reference_data(request, "Report/GetReportMenuWithSubCategories", {}, "Failed to fetch report menu")
 
 # ============================================================
 #  REPORT FILTERS (semester list for a report type)
@@ -1386,22 +2270,33 @@ async def get_report_filters(request: Request, reportSubId: int, studtblId: str)
     # SECURITY: Validate user owns this resource
     await validate_request_authorization(request, studtblId, "/api/reports/filters")
 
+    key = student_cache_key(get_institution_id(request), studtblId, f"report_filters:{reportSubId}")
+    entry = await get_student_entry(request, key)
+    if entry is not None:
+        return cached_json_response(request, entry)
+
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/Report/GetReportFilterByReportId"
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"ReportSubId": reportSubId, "studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"ReportSubId": reportSubId, "studtblId": studtblId}, headers=headers)
             if resp.status_code == 200:
                 json_data = resp.json()
                 if "data" in json_data and "semesterData" in json_data.get("data", {}):
+                    accepted_tokens.add(headers["Authorization"])
                     semesters = json_data["data"]["semesterData"]
-                    return {
+                    data = {
                         "semesters": [
                             {"id": s.get("semesterId"), "name": s.get("semesterName", ""), "number": s.get("semesterNo", 0)}
                             for s in semesters
                         ]
                     }
+                    # The semester list only grows when the student moves up a semester
+                    decision = classify_semester_list([s["number"] for s in data["semesters"]],
+                                                      await current_semester(request, studtblId))
+                    entry = await response_cache.set(key, encode_json(data), decision.server_ttl)
+                    return cached_json_response(request, entry)
     except Exception as e:
         pass
     
@@ -1433,45 +2328,54 @@ async def download_report(request: Request):
     
     report_name = body.get("reportName", "Attendance")
     semester_id = body.get("semesterId", 6)
+    disposition = {"Content-Disposition": f"inline; filename={report_name}_sem{semester_id}.pdf"}
+
+    key = None
+    pdf_ttl = PDF_CACHE_TTL
+    if body.get("studtblId"):
+        # SECURITY: Cached PDFs are keyed by studtblId, so ownership must be checked before serving one
+        await validate_request_authorization(request, body["studtblId"], "/api/reports/download")
+        # A finished semester's report never changes: keep it until evicted
+        decision = classify_semester(semester_id, await current_semester(request, body["studtblId"]))
+        if decision.server_ttl is None:
+            pdf_ttl = None
+            disposition["Cache-Control"] = decision.cache_control
+        key = pdf_key(request, body)
+        stored = await serve_stored_blob(request, key, disposition, store=pdf_store)
+        if stored:
+            return stored
     
-    
-    async def try_download(payload: dict) -> Response | None:
-        """Try a single download request, return Response on success or None."""
+    async def try_download(payload: dict) -> UpstreamStream | None:
+        """Open a single download; return the stream if its first chunk looks like a PDF, or None."""
         try:
-            async with get_client(request) as client:
-                resp = await client.post(upstream_url, json=payload, headers=headers)
-                ct = resp.headers.get('content-type', '').lower()
-                size = len(resp.content)
-                
-                # Check for PDF regardless of status code
-                if resp.content[:5] == b'%PDF-' or ('pdf' in ct and size > 200):
-                    return Response(
-                        content=resp.content,
-                        media_type="application/pdf",
-                        status_code=200,
-                        headers={"Content-Disposition": f"inline; filename={report_name}_sem{semester_id}.pdf"}
-                    )
-                
-                if 'octet-stream' in ct and size > 500:
-                    return Response(
-                        content=resp.content,
-                        media_type="application/pdf",
-                        status_code=200,
-                        headers={"Content-Disposition": f"inline; filename={report_name}_sem{semester_id}.pdf"}
-                    )
-                return None
+            upstream = await open_upstream_stream(request, "POST", upstream_url, json=payload, headers=headers)
         except Exception as e:
             return None
+        ct = upstream.headers.get('content-type', '').lower()
+        # Only the first chunk is inspected; the size checks fall back to
+        # Content-Length when the body is longer than one chunk
+        size = max(len(upstream.first), int(upstream.headers.get('content-length') or 0))
+
+        # Check for PDF regardless of status code
+        if upstream.first[:5] == b'%PDF-' or ('pdf' in ct and size > 200) or ('octet-stream' in ct and size > 500):
+            return upstream
+        await upstream.aclose()
+        return None
 
-    # Attempt 1: As-is
-    res = await try_download(body)
-    if res: return res
-
-    # Attempt 2: Alternate names if failed
+    # Some institutions only accept an alternate report name. The name that
+    # worked is learned per institution; until then both are raced.
     alt_map = {"CAT Performance": "CAT", "University-End Semester": "End Semester"}
+    attempts = {report_name: lambda: try_download(body)}
     if report_name in alt_map:
-        res = await try_download({**body, "reportName": alt_map[report_name]})
-        if res: return res
+        attempts[alt_map[report_name]] = lambda: try_download({**body, "reportName": alt_map[report_name]})
+
+    _, upstream = await upstream_variants.call(get_institution_id(request), f"report:{report_name}", attempts,
+                                               discard=lambda stream: stream.aclose())
+    if upstream:
+        # Only a verified PDF is worth keeping
+        store_key = key if upstream.first[:5] == b'%PDF-' else None
+        return await stream_passthrough(request, upstream, "application/pdf", disposition, status_code=200,
+                                        key=store_key, ttl=pdf_ttl, store=pdf_store)
 
     return Response(status_code=502, content=json.dumps({"error": "Failed to generate report"}).encode())
 
@@ -1516,7 +2420,7 @@ async def get_report(request: Request, studtblId: str, type: str):
     
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"ReportSubId": report_sub_id, "studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"ReportSubId": report_sub_id, "studtblId": studtblId}, headers=headers)
             
             if resp.status_code == 200:
                 json_data = resp.json()
@@ -1576,15 +2480,18 @@ async def get_attendance_course_detail(request: Request, studtblId: str):
     if test_ctx:
         return {"success": True, "data": test_ctx["attendance"]["course"]}
 
+    params = build_attendance_params(request)
+    params["studtblId"] = studtblId
+    return await fetch_attendance_course_detail(request, params)
+
+async def fetch_attendance_course_detail(request: Request, params: dict) -> dict:
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/Student/GetAttendanceCourseDetail"
-    params = build_attendance_params(request)
-    params["studtblId"] = fix_id(studtblId)
-    inst_id = request.headers.get("X-Institution-Id", "SEC").upper()
+    inst_id = get_institution_id(request)
 
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200:
                 json_data = resp.json()
                 items = _extract_attendance_data(json_data, inst_id)
@@ -1616,37 +2523,51 @@ async def get_attendance_daily_detail(request: Request, studtblId: str):
     if test_ctx:
         return {"success": True, "data": test_ctx["attendance"]["daily"]}
 
-    base_url, headers = get_institution_config(request)
     params = build_attendance_params(request)
     params["studtblId"] = fix_id(studtblId)
-    inst_id = request.headers.get("X-Institution-Id", "SEC").upper()
+    return await fetch_attendance_daily_detail(request, params)
 
-    # SIT and SEC use same endpoint; try both spellings (Attedance typo vs Attendance)
-    endpoints = [
-        f"{base_url}/Student/GetStudentDailyAttedanceDetail",
-        f"{base_url}/Student/GetStudentDailyAttendanceDetail",
-    ]
+async def fetch_attendance_daily_detail(request: Request, params: dict) -> dict:
+    base_url, headers = get_institution_config(request)
+    inst_id = get_institution_id(request)
 
-    try:
-        async with get_client(request) as client:
-            for upstream_url in endpoints:
+    # SIT and SEC use same endpoint under two spellings (Attedance typo vs Attendance);
+    # the one that answers is learned per institution and tried first next time
+    endpoints = {
+        "GetStudentDailyAttedanceDetail": f"{base_url}/Student/GetStudentDailyAttedanceDetail",
+        "GetStudentDailyAttendanceDetail": f"{base_url}/Student/GetStudentDailyAttendanceDetail",
+    }
+
+    def attempt(upstream_url: str):
+        async def fetch():
+            # Direct call (not coalesced) so a losing probe can be cancelled
+            async with get_client(request) as client:
                 resp = await client.get(upstream_url, params=params, headers=headers)
                 if resp.status_code == 200:
-                    json_data = resp.json()
-                    data = _extract_attendance_data(json_data, inst_id)
-                    
-                    # Calculate ODs for debugging
-                    od_count = 0
-                    if isinstance(data, list):
-                        for item in data:
-                            # Check known fields for OD status
-                            status = str(item.get("attendanceStatus") or item.get("presentAbsent") or "").upper()
-                            if "OD" in status or "DUTY" in status:
-                                od_count += 1
-                    else:
-                        pass
-                    
-                    return {"success": True, "data": data}
+                    return resp.json()
+            return None
+        return fetch
+
+    try:
+        _, json_data = await upstream_variants.call(
+            get_institution_id(request), "daily-attendance",
+            {name: attempt(url) for name, url in endpoints.items()}
+        )
+        if json_data is not None:
+            data = _extract_attendance_data(json_data, inst_id)
+            
+            # Calculate ODs for debugging
+            od_count = 0
+            if isinstance(data, list):
+                for item in data:
+                    # Check known fields for OD status
+                    status = str(item.get("attendanceStatus") or item.get("presentAbsent") or "").upper()
+                    if "OD" in status or "DUTY" in status:
+                        od_count += 1
+            else:
+                pass
+            
+            return {"success": True, "data": data}
     except Exception as e:
         pass
     return {"error": "Failed to fetch daily attendance"}
@@ -1666,7 +2587,7 @@ async def get_attendance_overall_detail(request: Request, studtblId: str):
 
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200:
                 json_data = resp.json()
                 data = _extract_attendance_data(json_data)
@@ -1683,15 +2604,18 @@ async def get_leave_status(request: Request, studtblId: str):
     if test_ctx:
         return {"success": True, "data": test_ctx["attendance"]["leave"]}
 
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Student/GetLeaveStatusByStudent"
     params = build_attendance_params(request)
     params["studtblId"] = fix_id(studtblId)
-    inst_id = request.headers.get("X-Institution-Id", "SEC").upper()
+    return await fetch_leave_status(request, params)
+
+async def fetch_leave_status(request: Request, params: dict) -> dict:
+    base_url, headers = get_institution_config(request)
+    upstream_url = f"{base_url}/Student/GetLeaveStatusByStudent"
+    inst_id = get_institution_id(request)
 
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200:
                 json_data = resp.json()
                 data = _extract_attendance_data(json_data, inst_id)
@@ -1700,6 +2624,54 @@ async def get_leave_status(request: Request, studtblId: str):
         pass
     return {"error": "Failed to fetch leave status"}
 
+# ============================================================
+#  ATTENDANCE BUNDLE (the attendance view in one round-trip)
+# ============================================================
+ATTENDANCE_BUNDLE_DEADLINE = float(os.environ.get("ATTENDANCE_BUNDLE_DEADLINE", 12))
+
+@app.get("/api/attendance/bundle")
+async def get_attendance_bundle(request: Request, studtblId: str, programmeId: int = 1, semesterType: str = "Even",
+                                stream: Optional[str] = Query(None, pattern="^(ndjson|sse)$")):
+    """
+    Daily, leave and course attendance plus exam status and arrears in one response.
+    Takes the same query params as the individual endpoints, builds them once and
+    runs every upstream call concurrently under ATTENDANCE_BUNDLE_DEADLINE seconds.
+    ?stream=ndjson|sse sends each section as soon as it is ready.
+    """
+    studtblId = fix_id(studtblId)
+
+    # SECURITY: Validate user owns this resource
+    await validate_request_authorization(request, studtblId, "/api/attendance/bundle")
+    test_ctx = _get_test_context(request, studtblId)
+    if test_ctx:
+        arrears = test_ctx["arrears"]
+        return await run_sections({
+            "daily": static_section({"success": True, "data": test_ctx["attendance"]["daily"]}),
+            "leave": static_section({"success": True, "data": test_ctx["attendance"]["leave"]}),
+            "course": static_section({"success": True, "data": test_ctx["attendance"]["course"]}),
+            "exam_status": static_section(test_ctx["exam_status"]),
+            "arrears": static_section({"success": True, "count": len(arrears), "data": arrears}),
+        }, ATTENDANCE_BUNDLE_DEADLINE, stream)
+
+    params = build_attendance_params(request)
+    params["studtblId"] = studtblId
+    try:
+        ids = {name: int(value) for name, value in params.items() if name != "studtblId"}
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Attendance ids must be integers")
+
+    return await run_sections({
+        "daily": lambda: fetch_attendance_daily_detail(request, params),
+        "leave": lambda: fetch_leave_status(request, params),
+        "course": lambda: fetch_attendance_course_detail(request, params),
+        "exam_status": lambda: fetch_exam_status(
+            request, studtblId, ids["AcademicYearId"], ids["YearOfStudyId"], ids["SemesterId"],
+            ids["BranchId"], ids["SectionId"], semesterType),
+        "arrears": lambda: fetch_arrears(
+            request, studtblId, ids["AcademicYearId"], ids["BranchId"], ids["YearOfStudyId"],
+            ids["SemesterId"], ids["SectionId"], programmeId, semesterType),
+    }, ATTENDANCE_BUNDLE_DEADLINE, stream)
+
 # ============================================================
 # ============================================================
 #  INBOX
@@ -1711,7 +2683,7 @@ async def get_inbox(request: Request, receiver_id: str):
     upstream_url = f"{base_url}/Inbox/GetUnreadCategories"
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"Receiver": receiver_id}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"Receiver": receiver_id}, headers=headers)
             if resp.status_code == 200:
                 return resp.json()
     except Exception as e:
@@ -1731,14 +2703,85 @@ async def get_identifiers(request: Request, studtblId: str):
     if test_ctx:
         return {"success": True, "data": [test_ctx["identifiers"]]}
 
-    base_url, headers = get_institution_config(request)
-    upstream_url = f"{base_url}/Student/GetStudentIdentifiersById"
     try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
-            return Response(content=resp.content, status_code=resp.status_code, media_type="application/json")
+        result = await load_identifiers(request, studtblId)
     except Exception as e:
         return {"error": str(e)}
+    if isinstance(result, CacheEntry):
+        return cached_json_response(request, result)
+    return json_response(result.content, status_code=result.status_code)
+
+async def load_identifiers(request: Request, studtblId: str):
+    """
+    Identifiers from the response cache, fetched on a miss.
+
+    Returns:
+        The CacheEntry on success, or the upstream httpx.Response when it was not a 200
+    """
+    key = student_cache_key(get_institution_id(request), studtblId, "identifiers")
+    entry = await get_student_entry(request, key)
+    if entry is not None:
+        return entry
+
+    base_url, headers = get_institution_config(request)
+    upstream_url = f"{base_url}/Student/GetStudentIdentifiersById"
+    async with get_client(request) as client:
+        resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId}, headers=headers)
+    if resp.status_code != 200:
+        return resp
+    resp.json()  # Only cache well-formed JSON
+    accepted_tokens.add(headers["Authorization"])
+    return await response_cache.set(key, resp.content, PROFILE_CACHE_TTLS["identifiers"])
+
+# ============================================================
+#  DASHBOARD BOOTSTRAP (every dashboard section in one round-trip)
+# ============================================================
+async def _load_identifiers_entry(request: Request, studtblId: str) -> Optional[CacheEntry]:
+    result = await load_identifiers(request, studtblId)
+    return result if isinstance(result, CacheEntry) else None
+
+# Section name -> (loader returning a CacheEntry or None, error message)
+DASHBOARD_SECTIONS = {
+    "stats": (load_dashboard_stats, "Failed to fetch dashboard data"),
+    **{
+        section: (lambda request, studtblId, section=section: load_profile_section(request, section, studtblId), error_message)
+        for section, (_, _, error_message) in PROFILE_SECTIONS.items()
+    },
+    "identifiers": (_load_identifiers_entry, "Failed to fetch identifiers"),
+}
+
+DASHBOARD_BOOTSTRAP_DEADLINE = float(os.environ.get("DASHBOARD_BOOTSTRAP_DEADLINE", 12))
+
+@app.get("/api/dashboard/bootstrap")
+async def get_dashboard_bootstrap(request: Request, studtblId: str,
+                                  stream: Optional[str] = Query(None, pattern="^(ndjson|sse)$")):
+    """
+    Everything the dashboard shows on load, in one response.
+    Authorizes once, loads every section concurrently through the same caches as
+    the individual endpoints, and reports a status per section so one failing
+    upstream call doesn't fail the rest. ?stream=ndjson|sse sends each section
+    as soon as it is ready.
+    """
+    studtblId = fix_id(studtblId)
+
+    # SECURITY: Validate user owns this resource
+    await validate_request_authorization(request, studtblId, "/api/dashboard/bootstrap")
+    test_ctx = _get_test_context(request, studtblId)
+    if test_ctx:
+        return await run_sections({
+            **{section: static_section(test_ctx[section]) for section in DASHBOARD_SECTIONS if section != "identifiers"},
+            "identifiers": static_section({"success": True, "data": [test_ctx["identifiers"]]}),
+        }, DASHBOARD_BOOTSTRAP_DEADLINE, stream)
+
+    def load(section: str):
+        loader, error_message = DASHBOARD_SECTIONS[section]
+        async def run():
+            entry = await loader(request, studtblId)
+            return entry if entry is not None else {"error": error_message}
+        return run
+
+    return await run_sections({section: load(section) for section in DASHBOARD_SECTIONS},
+                              DASHBOARD_BOOTSTRAP_DEADLINE, stream)
 
 @app.get("/api/profile/achievements/studies")
 async def get_achievement_studies(request: Request, studtblId: str):
@@ -1752,7 +2795,7 @@ async def get_achievement_studies(request: Request, studtblId: str):
     upstream_url = f"{base_url}/Achievements/GetAchievementStudies"
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId}, headers=headers)
             return Response(content=resp.content, status_code=resp.status_code, media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
@@ -1766,7 +2809,7 @@ async def get_achievement_nptel(request: Request, studtblId: str):
     upstream_url = f"{base_url}/Achievements/GetNPTELSemesterList"
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId}, headers=headers)
             return Response(content=resp.content, status_code=resp.status_code, media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
@@ -1783,7 +2826,7 @@ async def get_achievement_amcat(request: Request, studtblId: str):
     upstream_url = f"{base_url}/Achievements/GetAmcatPgpaHeaderList"
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"studtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"studtblId": studtblId}, headers=headers)
             return Response(content=resp.content, status_code=resp.status_code, media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
@@ -1808,7 +2851,7 @@ async def get_course_details(request: Request, studtblId: str, regulationId: str
     }
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             return Response(content=resp.content, status_code=resp.status_code, media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
@@ -1827,7 +2870,7 @@ async def get_inbox_categories(request: Request, studtblId: str):
     upstream_url = f"{base_url}/Inbox/GetInboxCategory"
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params={"StudtblId": studtblId}, headers=headers)
+            resp = await upstream_get(client, upstream_url, params={"StudtblId": studtblId}, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch inbox categories"}
@@ -1866,7 +2909,7 @@ async def get_inbox_messages(
         params["IsRead"] = str(isRead).lower()
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
             if resp.status_code == 200: return resp.json()
     except Exception as e: pass
     return {"error": "Failed to fetch messages"}
@@ -1881,10 +2924,32 @@ async def get_message_details(request: Request, categoryGuid: str, messageGuid:
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/Inbox/GetMessageDetails"
     params = {"CategoryGuid": categoryGuid, "MessageGuid": messageGuid, "Receiver": receiver}
+
+    # A message never changes once sent. There is no ownership check on this
+    # route, so the cache key includes the caller's identity from the token,
+    # and only a token upstream has accepted can read it back.
+    decision = classify_by_guid(messageGuid)
+    user_id = resolve_identity(request).user_id
+    key = None
+    if user_id:
+        key = f"{get_institution_id(request)}:{user_id}:message:{receiver}:{categoryGuid}:{messageGuid}"
+        entry = await get_student_entry(request, key)
+        if entry is not None:
+            response = cached_json_response(request, entry)
+            response.headers["Cache-Control"] = decision.cache_control
+            return response
     try:
         async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
-            if resp.status_code == 200: return resp.json()
+            resp = await upstream_get(client, upstream_url, params=params, headers=headers)
+            if resp.status_code == 200:
+                data = resp.json()
+                if not key or not data.get("data"):
+                    return data
+                accepted_tokens.add(headers["Authorization"])
+                entry = await response_cache.set(key, resp.content, decision.server_ttl)
+                response = cached_json_response(request, entry)
+                response.headers["Cache-Control"] = decision.cache_control
+                return response
     except Exception as e: pass
     return {"error": "Failed to fetch message details"}
 
@@ -1903,22 +2968,165 @@ async def download_inbox_doc(request: Request, studtblId: str, documentId: str,
             headers={"Content-Disposition": f"attachment; filename=document_{documentId}.pdf"}
         )
 
+    disposition = {"Content-Disposition": f"attachment; filename=document_{documentId}"}
+    cache_headers = {**disposition, "Cache-Control": classify_by_guid(documentId).cache_control}
+    key = blob_key(request, studtblId, documentId, documentType)
+    stored = await serve_stored_blob(request, key, cache_headers)
+    if stored:
+        return stored
+
     base_url, headers = get_institution_config(request)
     upstream_url = f"{base_url}/Document/DownloadBlob"
     params = {"documentId": documentId, "studtblId": studtblId, "documentType": documentType}
     try:
-        async with get_client(request) as client:
-            resp = await client.get(upstream_url, params=params, headers=headers)
-            content_type = resp.headers.get("content-type", "application/octet-stream")
-            return StreamingResponse(
-                content=iter([resp.content]),
-                status_code=resp.status_code,
-                media_type=content_type,
-                headers={"Content-Disposition": f"attachment; filename=document_{documentId}"}
-            )
+        upstream = await open_upstream_stream(request, "GET", upstream_url, params=params, headers=headers)
     except Exception as e:
         return {"error": str(e)}
 
+    content_type = upstream.headers.get("content-type", "application/octet-stream")
+    if upstream.status_code == 200:
+        return await stream_passthrough(request, upstream, content_type, cache_headers, key=key)
+    return await stream_passthrough(request, upstream, content_type, disposition)
+
+# ============================================================
+#  BATCH (several GET routes in one HTTP request)
+# ============================================================
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", 10))
+BATCH_DEADLINE = float(os.environ.get("BATCH_DEADLINE", 15))
+
+# Headers that describe the batch POST itself rather than its sub-requests
+_BATCH_DROPPED_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"if-none-match", b"range", b"if-range"}
+
+# Routes that answer with a file: a batch would have to hold the whole body in memory
+_BATCH_EXCLUDED_PATHS = {"/api/profile/image", "/api/document/download-blob", "/api/inbox/download-doc"}
+
+def is_json_media_type(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() == "application/json"
+
+class _NotJSON(Exception):
+    """Raised from a batch sub-request's send() to stop a route that isn't answering with JSON."""
+
+class BatchSubRequest(BaseModel):
+    path: str
+    query: Union[Dict[str, Any], str] = {}
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+async def dispatch_internal(request: Request, path: str, query_string: str) -> Tuple[int, str, bytes]:
+    """
+    Run a GET route in-process through the router, skipping the network and the
+    middleware stack (the enclosing request was already rate limited).
+
+    Only a JSON body is collected. A route that starts any other response is
+    stopped there, as if its client went away, and its body is left empty.
+
+    Returns:
+        (status code, content type, body)
+    """
+    scope = dict(request.scope)  # Shares app, client, state and exception handlers
+    for stale in ("path_params", "endpoint", "route"):
+        scope.pop(stale, None)
+    scope.update({
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k not in _BATCH_DROPPED_HEADERS],
+        "extensions": {},  # No http.response.pathsend: file bodies must come through send()
+    })
+
+    result = {"status": 500, "content_type": "", "body": bytearray()}
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Never disconnects; streaming responses stop listening once they finish
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            for name, value in message.get("headers", []):
+                if name.lower() == b"content-type":
+                    result["content_type"] = value.decode("latin-1")
+            if result["status"] != 304 and not is_json_media_type(result["content_type"]):
+                raise _NotJSON()
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+
+    try:
+        await request.app.router(scope, receive, send)
+    except StarletteHTTPException as e:
+        # 404/405 from the router itself, outside any route's exception handling
+        return e.status_code, "application/json", encode_json({"detail": e.detail})
+    except _NotJSON:
+        return result["status"], result["content_type"], b""
+    return result["status"], result["content_type"], bytes(result["body"])
+
+@app.post("/api/batch")
+async def batch_requests(request: Request, payload: BatchRequest):
+    """
+    Run up to BATCH_MAX_REQUESTS GET routes of this API concurrently and return
+    their results in order. The batch is rate limited once and authenticated once;
+    each sub-request still runs its route's own ownership check. Sub-requests still
+    running after BATCH_DEADLINE seconds are cancelled and reported as 504.
+    Only JSON routes can be batched.
+    """
+    if len(payload.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_REQUESTS} sub-requests per batch")
+
+    # Sub-requests share request.state, and with it this identity
+    identity = resolve_identity(request)
+    if not identity.user_id:
+        audit_logger.log_token_validation_failure(
+            reason="Missing or invalid token",
+            ip_address=identity.client_ip
+        )
+        raise HTTPException(status_code=401, detail="Authentication required")
+    request.state.authorized_studtbl_ids = set()
+
+    if not payload.requests:
+        return {"results": []}
+
+    started = time.monotonic()
+
+    async def run(sub: BatchSubRequest):
+        query = sub.query if isinstance(sub.query, str) else urlencode(sub.query, doseq=True)
+        # Files and ?stream= bundles are rejected up front rather than buffered
+        if not sub.path.startswith("/api/") or sub.path == "/api/batch" \
+                or sub.path in _BATCH_EXCLUDED_PATHS or "stream" in parse_qs(query):
+            status_code, content_type, body = 400, "application/json", encode_json({"detail": "Not a batchable route"})
+        else:
+            try:
+                status_code, content_type, body = await dispatch_internal(request, sub.path, query)
+            except Exception as e:
+                status_code, content_type, body = 500, "application/json", encode_json({"detail": "Internal error"})
+        return status_code, content_type, body, round((time.monotonic() - started) * 1000, 1)
+
+    tasks = [asyncio.create_task(run(sub)) for sub in payload.requests]
+    _, pending = await asyncio.wait(tasks, timeout=BATCH_DEADLINE)
+    for task in pending:
+        task.cancel()
+
+    results = []
+    for sub, task in zip(payload.requests, tasks):
+        if task in pending:
+            results.append(encode_json({"path": sub.path, "status": 504, "error": "Timed out",
+                                        "elapsed_ms": round(BATCH_DEADLINE * 1000, 1)}))
+            continue
+        status_code, content_type, body, elapsed = task.result()
+        meta = {"path": sub.path, "status": status_code, "elapsed_ms": elapsed}
+        if is_json_media_type(content_type):
+            results.append(encode_json(meta)[:-1] + b',"body":' + (body or b"null") + b"}")
+        else:
+            meta["error"] = "Only JSON routes can be batched"
+            results.append(encode_json(meta))
+    return json_response(b'{"results":[' + b",".join(results) + b"]}")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
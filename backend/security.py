@@ -5,15 +5,28 @@ Handles JWT validation, authorization, rate limiting, and audit logging.
 
 from fastapi import HTTPException, Request, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional, Dict, Any
+from collections import OrderedDict, deque
+from logging.handlers import MemoryHandler, QueueListener, RotatingFileHandler
+from typing import Optional, Dict, Any, NamedTuple
+import asyncio
+import atexit
 import jwt
 import base64
 import hashlib
+import json
 import logging
+import math
+import os
+import queue
+import random
+import re
+import threading
 import time
-from functools import wraps
+from functools import lru_cache, wraps
 from datetime import datetime
 
+from cache import CounterBackend, create_counter_backend
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,15 +39,85 @@ TOKEN_TOLERANCE = 300  # 5 minutes tolerance for clock skew
 security = HTTPBearer()
 
 
+class _JSONLineFormatter(logging.Formatter):
+    """Audit records carry the event dict as msg; encode it on the writer thread."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str, separators=(",", ":"))
+
+
 class SecurityAuditLogger:
-    """Audit logger for security events."""
+    """
+    Audit logger for security events.
+
+    The most recent events are kept in a fixed-size ring buffer (events) for
+    the audit query endpoint. Each kept event is also queued to a writer
+    thread that appends JSON lines to a rotating file. Successes are written
+    in batches of flush_batch; anything else is flushed at once. The request
+    path only appends to the deque and the queue. Success events, by far the
+    most common, can be sampled with success_sample_rate.
+    """
 
-    def __init__(self):
-        self.events = []
+    def __init__(self, buffer_size: int = 1000, log_path: Optional[str] = None,
+                 success_sample_rate: float = 1.0, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5, flush_batch: int = 64):
+        self.events: deque = deque(maxlen=buffer_size)
+        self.log_path = log_path
+        self.success_sample_rate = success_sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_batch = flush_batch
+        self.logged = 0
+        self.sampled_out = 0
+        self._queue: Optional[queue.SimpleQueue] = None
+        self._listener: Optional[QueueListener] = None
+        self._handler: Optional[logging.Handler] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _writer_queue(self) -> Optional[queue.SimpleQueue]:
+        """
+        The queue feeding the file writer, started on first use.
+
+        A forked worker doesn't inherit the parent's thread, so each process
+        starts its own writer (and, with {pid} in log_path, its own file).
+        """
+        if not self.log_path:
+            return None
+        if self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid():
+                file_handler = RotatingFileHandler(
+                    self.log_path.format(pid=os.getpid()), maxBytes=self.max_bytes,
+                    backupCount=self.backup_count, encoding="utf-8", delay=True,
+                )
+                file_handler.setFormatter(_JSONLineFormatter())
+                self._handler = MemoryHandler(self.flush_batch, flushLevel=logging.WARNING, target=file_handler)
+                self._queue = queue.SimpleQueue()
+                self._listener = QueueListener(self._queue, self._handler)
+                self._listener.start()
+                if self._pid is None:
+                    atexit.register(self.close)
+                self._pid = os.getpid()
+        return self._queue
+
+    def close(self):
+        """Stop the writer thread and flush what it holds."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            target = self._handler.target
+            self._handler.close()
+            target.close()
+            self._listener = None
+            self._pid = None
 
     def log_event(self, event_type: str, user_id: str, details: Dict[str, Any],
                   ip_address: str, status: str = "success"):
         """Log a security event."""
+        if status == "success" and self.success_sample_rate < 1 and random.random() >= self.success_sample_rate:
+            self.sampled_out += 1
+            return
         event = {
             "timestamp": datetime.utcnow().isoformat(),
             "event_type": event_type,
@@ -44,7 +127,40 @@ class SecurityAuditLogger:
             "details": details
         }
         self.events.append(event)
-        logger.info(f"Security Event [{event_type}]: User={user_id}, Status={status}, IP={ip_address}")
+        self.logged += 1
+        writer = self._writer_queue()
+        if writer is not None:
+            level = logging.INFO if status == "success" else logging.WARNING
+            writer.put(logging.makeLogRecord({"msg": event, "levelno": level, "levelname": logging.getLevelName(level)}))
+        if status != "success":
+            logger.info(f"Security Event [{event_type}]: User={user_id}, Status={status}, IP={ip_address}")
+
+    def query(self, event_type: Optional[str] = None, status: Optional[str] = None,
+              user_id: Optional[str] = None, limit: int = 100) -> list:
+        """Most recent buffered events first, optionally filtered."""
+        matches = []
+        for event in reversed(list(self.events)):
+            if event_type and event["event_type"] != event_type:
+                continue
+            if status and event["status"] != status:
+                continue
+            if user_id and event["user_id"] != user_id:
+                continue
+            matches.append(event)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        return {
+            "buffered": len(self.events),
+            "buffer_size": self.events.maxlen,
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "success_sample_rate": self.success_sample_rate,
+            "log_path": self.log_path.format(pid=os.getpid()) if self.log_path else None,
+        }
 
     def log_authorization_failure(self, user_id: str, requested_id: str,
                                    endpoint: str, ip_address: str):
@@ -72,14 +188,23 @@ class SecurityAuditLogger:
         )
 
 
-# Global security audit logger instance
-audit_logger = SecurityAuditLogger()
+# Global security audit logger instance. AUDIT_LOG_PATH may contain {pid} so
+# each worker rotates its own file; set it empty to keep events in memory only.
+audit_logger = SecurityAuditLogger(
+    buffer_size=int(os.environ.get("AUDIT_BUFFER_SIZE", 1000)),
+    log_path=os.environ.get("AUDIT_LOG_PATH", "/tmp/edumate-audit.{pid}.jsonl"),
+    success_sample_rate=float(os.environ.get("AUDIT_SUCCESS_SAMPLE_RATE", 0.1)),
+    max_bytes=int(os.environ.get("AUDIT_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+    backup_count=int(os.environ.get("AUDIT_LOG_BACKUPS", 5)),
+)
 
 
+@lru_cache(maxsize=4096)
 def decode_studtbl_id(studtbl_id: str) -> Optional[str]:
     """
     Decode and normalize studtblId for comparison.
     Since studtblId appears to be base64 encoded, we decode it to get the actual ID.
+    Memoized: the same few ids are decoded on every request.
     """
     try:
         # Fix URL encoding issues first
@@ -92,6 +217,161 @@ def decode_studtbl_id(studtbl_id: str) -> Optional[str]:
         return studtbl_id
 
 
+class TokenClaims(NamedTuple):
+    """What the request path needs from a bearer token, decoded once per token."""
+    claims: Dict[str, Any]  # empty if the token could not be decoded
+    user_id: Optional[str]
+    normalized_user_id: Optional[str]  # decode_studtbl_id(user_id)
+    is_test_user: bool
+    expires_at: float  # when this cache entry lapses
+
+
+def _user_id_claim(decoded: Dict[str, Any]) -> Optional[str]:
+    # Try common JWT claim names for user ID
+    return (
+        decoded.get('sub') or
+        decoded.get('userId') or
+        decoded.get('user_id') or
+        decoded.get('studtblId') or
+        decoded.get('studentId') or
+        decoded.get('id')
+    )
+
+
+class ClaimsCache:
+    """
+    Decoded JWT claims keyed by sha256(token), so raw tokens are never held.
+
+    An entry lives until the token's exp (capped at max_ttl). Tokens without
+    a future exp, and tokens that fail to decode, are kept for invalid_ttl so
+    a client retrying a bad token does not cost a decode per request.
+    """
+
+    def __init__(self, max_entries: int = 10_000, max_ttl: float = 3600.0, invalid_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.invalid_ttl = invalid_ttl
+        self._entries: "OrderedDict[bytes, TokenClaims]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> TokenClaims:
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        self.misses += 1
+        entry = self._decode(token, now)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _decode(self, token: str, now: float) -> TokenClaims:
+        try:
+            # Decode JWT without verification (we're validating ownership, not signature)
+            # The upstream ERP will validate the signature
+            decoded = jwt.decode(token, options={"verify_signature": False})
+        except jwt.InvalidTokenError as e:
+            logger.warning(f"Invalid token: {str(e)}")
+            return TokenClaims({}, None, None, False, now + self.invalid_ttl)
+        except Exception as e:
+            logger.error(f"Error extracting user ID from token: {str(e)}")
+            return TokenClaims({}, None, None, False, now + self.invalid_ttl)
+
+        user_id = _user_id_claim(decoded)
+        exp = decoded.get("exp")
+        if isinstance(exp, (int, float)) and exp > now:
+            expires_at = min(exp, now + self.max_ttl)
+        else:
+            expires_at = now + self.invalid_ttl
+        return TokenClaims(
+            decoded,
+            user_id,
+            decode_studtbl_id(str(user_id)) if user_id else None,
+            bool(decoded.get("is_test_user")),
+            expires_at,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+claims_cache = ClaimsCache()
+
+
+def token_claims(token: str) -> TokenClaims:
+    """Claims for a bearer token (with or without the 'Bearer ' prefix), from cache."""
+    if token.startswith('Bearer '):
+        token = token[7:]
+    return claims_cache.get(token)
+
+
+class AcceptedTokens:
+    """
+    sha256 of bearer tokens the upstream ERP has answered with a student's data.
+
+    Claims are decoded without the signing key, so on their own they only say
+    who a token claims to be for. Cached student data is served only to a
+    token in here: a forged token always misses the cache and goes upstream,
+    where it is rejected. An entry lapses with the token's claims cache entry
+    (its exp, capped at ClaimsCache.max_ttl). Kept per worker.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        if token.startswith('Bearer '):
+            token = token[7:]
+        return hashlib.sha256(token.encode()).digest()
+
+    def add(self, token: Optional[str]):
+        """Record that upstream accepted token (with or without the 'Bearer ' prefix)."""
+        if not token or token == 'Bearer ':
+            return
+        expires_at = token_claims(token).expires_at
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, token: Optional[str]) -> bool:
+        if not token:
+            return False
+        key = self._key(token)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        with self._lock:
+            return {"entries": len(self._entries)}
+
+
+accepted_tokens = AcceptedTokens()
+
+
 def extract_user_id_from_token(token: str, verify: bool = False) -> Optional[str]:
     """
     Extract user ID from JWT token without verification.
@@ -106,26 +386,15 @@ def extract_user_id_from_token(token: str, verify: bool = False) -> Optional[str
     Returns:
         User ID from token or None if extraction fails
     """
+    if not verify:
+        return token_claims(token).user_id
     try:
         # Remove 'Bearer ' prefix if present
         if token.startswith('Bearer '):
             token = token[7:]
 
-        # Decode JWT without verification (we're validating ownership, not signature)
-        # The upstream ERP will validate the signature
         decoded = jwt.decode(token, options={"verify_signature": verify})
-
-        # Try common JWT claim names for user ID
-        user_id = (
-            decoded.get('sub') or
-            decoded.get('userId') or
-            decoded.get('user_id') or
-            decoded.get('studtblId') or
-            decoded.get('studentId') or
-            decoded.get('id')
-        )
-
-        return user_id
+        return _user_id_claim(decoded)
     except jwt.ExpiredSignatureError:
         logger.warning("Token has expired")
         return None
@@ -195,10 +464,12 @@ async def verify_token_and_ownership(
     return user_id
 
 
+@lru_cache(maxsize=4096)
 def validate_studtbl_id_format(studtbl_id: str) -> bool:
     """
     Validate that studtblId has the expected format.
     This helps prevent injection attacks and invalid IDs.
+    Memoized, like decode_studtbl_id.
 
     Args:
         studtbl_id: The studtblId to validate
@@ -257,8 +528,15 @@ async def validate_request_authorization(
     Returns:
         True if authorized, raises HTTPException otherwise
     """
-    # Get current user from request
-    user_id = await get_current_user_from_request(request)
+    # A batch authenticates once and shares the result with its sub-requests
+    # through request.state; ids already validated in that batch are not rechecked.
+    authorized_ids = getattr(request.state, "authorized_studtbl_ids", None)
+    if authorized_ids is not None and studtbl_id in authorized_ids:
+        return True
+
+    # Get current user from the identity security_middleware resolved, if any
+    identity = getattr(request.state, "identity", None)
+    user_id = identity.user_id if identity is not None else await get_current_user_from_request(request)
 
     if not user_id:
         audit_logger.log_token_validation_failure(
@@ -319,11 +597,172 @@ async def validate_request_authorization(
         }
     )
 
+    if authorized_ids is not None:
+        authorized_ids.add(studtbl_id)
     return True
 
 
-# Rate limiting storage (in production, use Redis or similar)
-rate_limit_storage: Dict[str, list] = {}
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window-counter rate limiter with bounded memory.
+
+    Each key keeps two counters: requests in the current fixed window and in
+    the one before it. The previous count is weighted by how much of that
+    window still overlaps the sliding window, which approximates a log of
+    request timestamps in O(1) time and constant memory per key.
+
+    Keys are kept in least-recently-seen order. Each call evicts at most two
+    keys idle for longer than idle_ttl from the old end, and no more than
+    max_keys are tracked; a key dropped early simply starts over.
+
+    With a shared CounterBackend the window counts are kept there, so every
+    worker (and node, with Redis) enforces the same limit. To keep the shared
+    store off the hot path, a worker leases up to lease_size requests per
+    round trip and spends them locally. Leased but unspent requests still
+    count, so the limit errs towards admitting fewer requests, never more.
+    """
+
+    def __init__(self, max_keys: int = 100_000, idle_ttl: float = 120.0,
+                 backend: Optional[CounterBackend] = None, lease_size: int = 5):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.backend = backend
+        self.lease_size = lease_size
+        # key -> [window index, current count, previous count, last seen, leased]
+        # With a backend the counts are the shared totals last seen, and
+        # previous is None until fetched
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.evictions = 0
+        self.leases = 0
+        self.backend_errors = 0
+
+    def hit(self, key: str, max_requests: int, window_seconds: float, now: Optional[float] = None,
+            local_only: bool = False) -> Optional[bool]:
+        """
+        Count a request for key if it is within the limit.
+
+        Args:
+            local_only: Don't call the shared backend; return None instead
+                when this request needs a new lease
+
+        Returns:
+            True if allowed (and counted), False if the limit is reached
+        """
+        now = time.time() if now is None else now
+        position = now / window_seconds
+        index = int(position)
+        weight = 1 - (position - index)
+        with self._lock:
+            state = self._touch(key, index, now)
+            if self.backend is None:
+                allowed = state[2] * weight + state[1] < max_requests
+                if allowed:
+                    state[1] += 1
+                else:
+                    self.rejected += 1
+                return allowed
+            if state[4] > 0:
+                state[4] -= 1
+                return True
+            # Shared counts only grow within a window, so a local estimate
+            # already at the limit is safe to reject without asking
+            if state[2] is not None and state[2] * weight + state[1] >= max_requests:
+                self.rejected += 1
+                return False
+            if local_only:
+                return None
+            previous = state[2]
+        return self._lease(key, index, previous, weight, max_requests, window_seconds)
+
+    def _lease(self, key: str, index: int, previous: Optional[int], weight: float,
+               max_requests: int, window_seconds: float) -> bool:
+        """Take up to lease_size requests from the shared window count."""
+        window_key = f"{key}:{index}"
+        ttl = 2 * window_seconds + 1
+        try:
+            if previous is None:
+                previous = self.backend.get(f"{key}:{index - 1}")
+            count = self.backend.incr(window_key, self.lease_size, ttl)
+            base = previous * weight + count - self.lease_size
+            granted = max(0, min(self.lease_size, math.ceil(max_requests - base)))
+            if granted < self.lease_size:
+                count = self.backend.incr(window_key, granted - self.lease_size, ttl)
+        except Exception as e:
+            # Fail open: an unreachable store must not take the API down
+            self.backend_errors += 1
+            logger.warning(f"Rate limit backend unavailable: {str(e)}")
+            return True
+
+        with self._lock:
+            self.leases += 1
+            state = self._windows.get(key)
+            if state is not None and state[0] == index:
+                state[1] = max(state[1], count)
+                state[2] = previous
+                state[4] += max(granted - 1, 0)
+            if not granted:
+                self.rejected += 1
+        return granted > 0
+
+    def _touch(self, key: str, index: int, now: float) -> list:
+        """Find or create key's state, rolling it into window index. Caller holds the lock."""
+        state = self._windows.get(key)
+        if state is None:
+            state = self._windows[key] = [index, 0, None if self.backend else 0, now, 0]
+        else:
+            self._windows.move_to_end(key)
+            if state[0] != index:
+                if self.backend is not None:
+                    # Other workers counted too: fetch the real total on the next lease
+                    state[2] = None
+                else:
+                    state[2] = state[1] if state[0] == index - 1 else 0
+                state[1] = 0
+                state[0] = index
+                state[4] = 0
+            state[3] = now
+        self._evict(now)
+        return state
+
+    def _evict(self, now: float):
+        """Caller holds the lock."""
+        windows = self._windows
+        while len(windows) > self.max_keys:
+            windows.popitem(last=False)
+            self.evictions += 1
+        for _ in range(2):
+            if not windows:
+                break
+            key, state = next(iter(windows.items()))
+            if now - state[3] < self.idle_ttl:
+                break
+            del windows[key]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        with self._lock:
+            return {
+                "keys": len(self._windows),
+                "max_keys": self.max_keys,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "backend": type(self.backend).__name__ if self.backend else None,
+                "leases": self.leases,
+                "backend_errors": self.backend_errors,
+            }
+
+
+# Idle keys must outlive the longest window in use. Window counts live in
+# RATE_LIMIT_BACKEND so the limit holds across workers and restarts.
+rate_limiter = SlidingWindowRateLimiter(
+    max_keys=int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100_000)),
+    idle_ttl=float(os.environ.get("RATE_LIMIT_IDLE_TTL", 120)),
+    backend=create_counter_backend(),
+    lease_size=int(os.environ.get("RATE_LIMIT_LEASE", 5)),
+)
 
 def check_rate_limit(key: str, max_requests: int = 100, window_seconds: int = 60) -> bool:
     """
@@ -337,34 +776,17 @@ def check_rate_limit(key: str, max_requests: int = 100, window_seconds: int = 60
     Returns:
         True if within rate limit, False if exceeded
     """
-    current_time = time.time()
-
-    # Initialize storage for this key if not exists
-    if key not in rate_limit_storage:
-        rate_limit_storage[key] = []
-
-    # Remove old requests outside the window
-    rate_limit_storage[key] = [
-        req_time for req_time in rate_limit_storage[key]
-        if current_time - req_time < window_seconds
-    ]
-
-    # Check if limit exceeded
-    if len(rate_limit_storage[key]) >= max_requests:
-        return False
-
-    # Add current request
-    rate_limit_storage[key].append(current_time)
-    return True
+    return rate_limiter.hit(key, max_requests, window_seconds)
 
 
-async def enforce_rate_limit(request: Request, identifier: Optional[str] = None):
+async def enforce_rate_limit(request: Request, identifier: Optional[str] = None, max_requests: int = 100):
     """
     Enforce rate limiting on requests.
 
     Args:
         request: FastAPI request object
         identifier: Optional identifier (uses IP if not provided)
+        max_requests: Requests allowed per minute for this identifier
 
     Raises:
         HTTPException: If rate limit is exceeded
@@ -372,13 +794,18 @@ async def enforce_rate_limit(request: Request, identifier: Optional[str] = None)
     # Use provided identifier or fall back to IP address
     key = identifier or (request.client.host if request.client else "unknown")
 
-    if not check_rate_limit(key, max_requests=100, window_seconds=60):
+    # Most requests are decided locally; a new lease from the shared store
+    # is taken off the event loop
+    allowed = rate_limiter.hit(key, max_requests, 60, local_only=True)
+    if allowed is None:
+        allowed = await asyncio.to_thread(check_rate_limit, key, max_requests, 60)
+    if not allowed:
         audit_logger.log_event(
             event_type="RATE_LIMIT_EXCEEDED",
             user_id=identifier or "unknown",
             ip_address=request.client.host if request.client else "unknown",
             status="blocked",
-            details={"limit": "100 requests per minute"}
+            details={"limit": f"{max_requests} requests per minute"}
         )
 
         raise HTTPException(
@@ -387,6 +814,8 @@ async def enforce_rate_limit(request: Request, identifier: Optional[str] = None)
         )
 
 
+_DISALLOWED_INPUT_CHARS = re.compile(r"[^A-Za-z0-9+/=\-_ .@]+")
+
 def sanitize_input(value: str, max_length: int = 200) -> str:
     """
     Sanitize user input to prevent injection attacks.
@@ -406,11 +835,4 @@ def sanitize_input(value: str, max_length: int = 200) -> str:
 
     # Remove potentially dangerous characters
     # Keep alphanumeric, basic punctuation, and common base64 characters
-    allowed_chars = set(
-        'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
-        '+/=-_ .@'
-    )
-
-    sanitized = ''.join(c for c in value if c in allowed_chars)
-
-    return sanitized.strip()
+    return _DISALLOWED_INPUT_CHARS.sub("", value).strip()
@@ -0,0 +1,92 @@
+"""
+TTL policy for Edumate Backend
+Classifies proxied responses as immutable, slow-changing or volatile and maps
+each class to a server-side cache TTL and a Cache-Control header.
+"""
+
+from typing import Optional, NamedTuple, Any
+
+IMMUTABLE = "immutable"
+SLOW_CHANGING = "slow_changing"
+VOLATILE = "volatile"
+
+
+class TTLDecision(NamedTuple):
+    kind: str
+    server_ttl: Optional[float]  # None = keep until evicted
+    cache_control: str
+
+
+# Every classified response is one student's data behind their token, so it
+# may only be kept by that student's browser, never by a shared proxy or CDN.
+POLICIES = {
+    # Past-semester results, closed records, messages and documents by GUID
+    IMMUTABLE: TTLDecision(IMMUTABLE, None, "private, max-age=31536000, immutable"),
+    # Profile data and per-semester listings: changes at most a few times a semester
+    SLOW_CHANGING: TTLDecision(SLOW_CHANGING, 1800, "private, max-age=1800"),
+    # Attendance, exam status, current-semester data
+    VOLATILE: TTLDecision(VOLATILE, 300, "private, max-age=300"),
+}
+
+# Profile photos can be replaced under the same document id
+PROFILE_IMAGE_CACHE_CONTROL = "private, max-age=86400"
+
+
+def policy(kind: str) -> TTLDecision:
+    return POLICIES[kind]
+
+
+def classify_path(path: str) -> Optional[TTLDecision]:
+    """
+    Default classification of a GET endpoint by path.
+
+    Returns:
+        The decision, or None for endpoints that get no caching headers
+    """
+    if "/api/dashboard/stats" in path or "/api/student/academic" in path or "/api/student/personal" in path or "/api/student/parent" in path:
+        return POLICIES[SLOW_CHANGING]
+    if "/api/attendance/" in path or "/api/reports/" in path or "/api/student/exam-status" in path or "/api/hallticket/" in path:
+        return POLICIES[VOLATILE]
+    return None
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_semester(semester_id: Any, current_semester: Any) -> TTLDecision:
+    """
+    Data for a semester the student has already finished never changes.
+
+    Args:
+        semester_id: Semester the data belongs to
+        current_semester: The student's current semester, if known
+
+    Returns:
+        IMMUTABLE for past semesters, VOLATILE for the current one or when unknown
+    """
+    semester = _as_int(semester_id)
+    current = _as_int(current_semester)
+    if semester is not None and current is not None and 0 < semester < current:
+        return POLICIES[IMMUTABLE]
+    return POLICIES[VOLATILE]
+
+
+def classify_semester_list(semester_numbers: list, current_semester: Any) -> TTLDecision:
+    """
+    A list of semesters only grows when the student moves to a new semester.
+
+    Returns:
+        SLOW_CHANGING when the current semester is known, VOLATILE otherwise
+    """
+    if _as_int(current_semester) is None or not semester_numbers:
+        return POLICIES[VOLATILE]
+    return POLICIES[SLOW_CHANGING]
+
+
+def classify_by_guid(guid: Optional[str]) -> TTLDecision:
+    """Messages and documents addressed by GUID/id are fixed once they exist."""
+    return POLICIES[IMMUTABLE] if guid else POLICIES[VOLATILE]
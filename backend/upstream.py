@@ -0,0 +1,272 @@
+"""
+Upstream request helpers for Edumate Backend
+Coalesces identical concurrent requests to the ERP so they share one connection,
+learns which variant of an inconsistently named upstream call works, learns
+when a follow-up call is worth starting speculatively, and streams large
+bodies through without buffering them.
+"""
+
+from typing import Optional, Dict, Any, Hashable, Callable, Awaitable, Tuple, AsyncIterator
+import asyncio
+import hashlib
+
+import httpx
+
+
+def request_key(method: str, url: str, params: Optional[dict], auth: str) -> tuple:
+    """
+    Build the in-flight table key for an upstream request.
+
+    The Authorization header is hashed so two students never share a
+    response, while the raw token is not kept in the table.
+    """
+    normalized_params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    auth_hash = hashlib.sha256(auth.encode()).hexdigest()
+    return (method.upper(), url, normalized_params, auth_hash)
+
+
+class SingleFlight:
+    """
+    In-flight request table.
+
+    The first caller for a key starts the upstream call; concurrent callers
+    with the same key await that same call instead of starting their own.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once per key at a time and share its result.
+
+        The call runs as its own task, so a caller that is cancelled (e.g. the
+        client disconnected) does not cancel the call for everyone else.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        total = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+class UpstreamStream:
+    """
+    An upstream response opened with stream=True whose first chunk has been read.
+
+    The first chunk is enough to check the status and sniff the content
+    (e.g. a PDF signature) before committing to pass the body through. The
+    rest is only read as it is consumed, so memory stays at one chunk
+    regardless of the body's size. The owner must call aclose().
+    """
+
+    def __init__(self, response: httpx.Response, first: bytes, chunks: AsyncIterator[bytes]):
+        self.response = response
+        self.first = first
+        self._chunks = chunks
+
+    @classmethod
+    async def open(cls, client: httpx.AsyncClient, method: str, url: str,
+                   chunk_size: int = 64 * 1024, **kwargs) -> "UpstreamStream":
+        """Send the request and read up to chunk_size bytes of the body."""
+        response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+        chunks = response.aiter_bytes(chunk_size)
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b""
+        except BaseException:
+            await response.aclose()
+            raise
+        return cls(response, first, chunks)
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.response.headers
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        """The whole body, starting with the chunk already read."""
+        if self.first:
+            yield self.first
+        async for chunk in self._chunks:
+            yield chunk
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+async def race(attempts: Dict[str, Callable[[], Awaitable[Any]]],
+               discard: Optional[Callable[[Any], Awaitable[Any]]] = None) -> Tuple[Optional[str], Any]:
+    """
+    Run attempts concurrently and return the first usable result.
+
+    An attempt is usable if it returns something other than None without
+    raising. The remaining attempts are cancelled as soon as one wins.
+
+    Args:
+        attempts: Attempt name -> coroutine factory
+        discard: Called with every usable result that did not win, for
+            results holding resources (e.g. an open UpstreamStream)
+
+    Returns:
+        (winning attempt name, result), or (None, None) if every attempt failed
+    """
+    tasks = {asyncio.ensure_future(fn()): name for name, fn in attempts.items()}
+    pending = set(tasks)
+    winner = None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result() is not None:
+                    if winner is None:
+                        winner = task
+                    elif discard is not None:
+                        await discard(task.result())
+        if winner is None:
+            return None, None
+        return tasks[winner], winner.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if discard is not None and pending:
+            # An attempt may finish before its cancellation lands
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if result is not None and not isinstance(result, BaseException):
+                    await discard(result)
+
+
+class VariantMemory:
+    """
+    Remembers which variant of an upstream call works for each institution.
+
+    The ERP exposes some endpoints under more than one spelling and accepts
+    different report names per institution. Once a variant succeeds it is
+    tried first (and alone) on later requests; while nothing is known, all
+    variants are raced concurrently.
+    """
+
+    def __init__(self):
+        self._learned: Dict[Tuple[str, str], str] = {}
+        self.known_hits = 0
+        self.known_misses = 0
+        self.races = 0
+
+    async def call(self, inst_id: str, family: str,
+                   attempts: Dict[str, Callable[[], Awaitable[Any]]],
+                   discard: Optional[Callable[[Any], Awaitable[Any]]] = None) -> Tuple[Optional[str], Any]:
+        """
+        Try the learned variant first, falling back to racing the others.
+
+        Args:
+            inst_id: Institution the call is made for
+            family: Name for the group of interchangeable variants
+            attempts: Variant name -> coroutine factory returning a result or None
+            discard: Passed to race() for results that lose
+
+        Returns:
+            (variant name, result), or (None, None) if no variant succeeded
+        """
+        key = (inst_id, family)
+        known = self._learned.get(key)
+        if known in attempts:
+            try:
+                result = await attempts[known]()
+            except Exception:
+                result = None
+            if result is not None:
+                self.known_hits += 1
+                return known, result
+            # The learned variant stopped working; relearn from the others
+            self.known_misses += 1
+            self._learned.pop(key, None)
+            attempts = {name: fn for name, fn in attempts.items() if name != known}
+
+        self.races += 1
+        name, result = await race(attempts, discard)
+        if name is not None:
+            self._learned[key] = name
+        return name, result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Learned table and counters, for the debug endpoint."""
+        learned: Dict[str, Dict[str, str]] = {}
+        for (inst_id, family), name in self._learned.items():
+            learned.setdefault(inst_id, {})[family] = name
+        return {
+            "learned": learned,
+            "known_hits": self.known_hits,
+            "known_misses": self.known_misses,
+            "races": self.races,
+        }
+
+
+class FallbackPredictor:
+    """
+    Learns, per key, how often a primary upstream call turns out to need a
+    follow-up call.
+
+    Where the follow-up is usually needed, callers start it speculatively
+    alongside the primary call rather than after it, saving a round-trip at
+    the cost of an occasional wasted (and cancelled) request.
+    """
+
+    def __init__(self, threshold: float = 0.5, alpha: float = 0.2, min_samples: int = 3):
+        self.threshold = threshold
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self._rates: Dict[Hashable, Tuple[float, int]] = {}  # key -> (EWMA of "needed", samples)
+        self.speculated = 0
+        self.hits = 0      # speculated and the follow-up was needed
+        self.wasted = 0    # speculated but not needed; the call was cancelled
+        self.missed = 0    # not speculated but needed; paid the sequential round-trip
+
+    def should_speculate(self, key: Hashable) -> bool:
+        rate, samples = self._rates.get(key, (0.0, 0))
+        return samples >= self.min_samples and rate >= self.threshold
+
+    def observe(self, key: Hashable, needed: bool, speculated: bool):
+        """Record whether the follow-up was needed for one primary call."""
+        rate, samples = self._rates.get(key, (0.0, 0))
+        value = 1.0 if needed else 0.0
+        rate = value if samples == 0 else rate + self.alpha * (value - rate)
+        self._rates[key] = (rate, samples + 1)
+        if speculated:
+            self.speculated += 1
+            if needed:
+                self.hits += 1
+            else:
+                self.wasted += 1
+        elif needed:
+            self.missed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        return {
+            "keys": len(self._rates),
+            "speculated": self.speculated,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "missed": self.missed,
+            "hit_rate": round(self.hits / self.speculated, 4) if self.speculated else 0.0,
+        }
@@ -80,21 +80,21 @@ export default function HallTicketView({ studtblId, academic, API, token, instit
             });
 
             try {
-                const [histRes, subRes, dlRes, notesRes, attRes, statsRes] = await Promise.all([
-                    fetch(`${API}/api/hallticket/history?studtblId=${encodeURIComponent(studtblId)}`, { headers }),
-                    fetch(`${API}/api/hallticket/subject-details?${params}`, { headers }),
-                    fetch(`${API}/api/hallticket/download-status?${params}`, { headers }),
-                    fetch(`${API}/api/hallticket/notes`, { headers }),
-                    fetch(`${API}/api/attendance/course-detail?${params}`, { headers }),
-                    fetch(`${API}/api/dashboard/stats?studtblId=${encodeURIComponent(studtblId)}`, { headers })
-                ]);
+                // One round-trip for the whole view; each section carries its own status
+                const res = await fetch(`${API}/api/hallticket/bundle?${params}`, { headers });
+                const bundle = res.ok ? await res.json() : {};
+                const section = (name: string) => {
+                    const s = bundle[name];
+                    if (!s) return null;
+                    return s.status === 'ok' ? s.data : { error: s.error };
+                };
 
-                const historyJson = await histRes.json().catch(() => null);
-                const subjectsJson = await subRes.json().catch(() => null);
-                const dlStatusJson = await dlRes.json().catch(() => null);
-                const notesJson = await notesRes.json().catch(() => null);
-                const attJson = await attRes.json().catch(() => null);
-                const statsJson = await statsRes.json().catch(() => null);
+                const historyJson = section('history');
+                const subjectsJson = section('subjects');
+                const dlStatusJson = section('download_status');
+                const notesJson = section('notes');
+                const attJson = section('course');
+                const statsJson = section('stats');
 
                 setData(prev => ({
                     ...prev,
@@ -120,6 +120,25 @@ const slideIn = {
     visible: { opacity: 1, x: 0, transition: { duration: 0.4, ease: "easeOut" as const } },
 };
 
+/* ── Read an NDJSON stream, calling onEvent for each line as it arrives ── */
+async function readNdjson(res: Response, onEvent: (event: any) => void) {
+    if (!res.body) return;
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        let newline;
+        while ((newline = buffered.indexOf('\n')) >= 0) {
+            const line = buffered.slice(0, newline).trim();
+            buffered = buffered.slice(newline + 1);
+            if (line) onEvent(JSON.parse(line));
+        }
+    }
+}
+
 /* ─────────────────────────────── Main Page ─────────────────────────── */
 
 export default function Dashboard() {
@@ -195,32 +214,23 @@ export default function Dashboard() {
 
         const fetchData = async () => {
             try {
-                // Fetch all data concurrently
-                const [statsRes, personalRes, academicRes, acadPctRes, parentRes, identifiersRes] = await Promise.all([
-                    fetch(`${API}/api/dashboard/stats?studtblId=${eid}`, { headers }),
-                    fetch(`${API}/api/student/personal?studtblId=${eid}`, { headers }),
-                    fetch(`${API}/api/student/academic?studtblId=${eid}`, { headers }),
-                    fetch(`${API}/api/student/academic-percentage?studtblId=${eid}`, { headers }),
-                    fetch(`${API}/api/student/parent?studtblId=${eid}`, { headers }),
-                    fetch(`${API}/api/profile/identifiers?studtblId=${eid}`, { headers })
-                ]);
-
-                // Parse responses
-                const [statsData, personalData, academicData, acadPctData, parentData, identifiersData] = await Promise.all([
-                    statsRes.ok ? statsRes.json() : null,
-                    personalRes.ok ? personalRes.json() : null,
-                    academicRes.ok ? academicRes.json() : null,
-                    acadPctRes.ok ? acadPctRes.json() : null,
-                    parentRes.ok ? parentRes.json() : null,
-                    identifiersRes.ok ? identifiersRes.json() : null
-                ]);
-
-                if (statsData) setStats(statsData);
-                if (personalData) setPersonal(personalData);
-                if (academicData) setAcademic(academicData);
-                if (acadPctData) setAcadPct(acadPctData);
-                if (parentData) setParentData(parentData);
-                if (identifiersData) setIdentifiers(identifiersData);
+                // One round-trip for every section, streamed so each card paints as soon as its data arrives
+                const setters: Record<string, (data: any) => void> = {
+                    stats: setStats,
+                    personal: setPersonal,
+                    academic: setAcademic,
+                    academic_percentage: setAcadPct,
+                    parent: setParentData,
+                    identifiers: setIdentifiers,
+                };
+                const res = await fetch(`${API}/api/dashboard/bootstrap?studtblId=${eid}&stream=ndjson`, { headers });
+                if (res.ok) {
+                    await readNdjson(res, (event) => {
+                        if (event.type !== 'section' || event.status !== 'ok') return;
+                        setters[event.name]?.(event.data);
+                        if (event.name === 'personal' || event.name === 'stats') setLoading(false);
+                    });
+                }
 
             } catch (err) {
                 console.error("Failed to load dashboard data", err);
@@ -363,39 +373,40 @@ export default function Dashboard() {
             });
 
             try {
-                const [dailyRes, leaveRes, courseRes, examRes, arrearsRes] = await Promise.all([
-                    fetch(`${API}/api/attendance/daily-detail?${params}`, { headers }),
-                    fetch(`${API}/api/attendance/leave-status?${params}`, { headers }),
-                    fetch(`${API}/api/attendance/course-detail?${params}`, { headers }),
-                    fetch(`${API}/api/student/exam-status?${params}`, { headers }),
-                    fetch(`${API}/api/student/arrears?${params}`, { headers })
-                ]);
+                // One round-trip for all five sections; each carries its own status
+                const res = await fetch(`${API}/api/attendance/bundle?${params}`, { headers });
+                const bundle = res.ok ? await res.json() : {};
+                const section = (name: string) => {
+                    const s = bundle[name];
+                    if (s?.status === 'ok') return { ok: true, json: s.data || {} };
+                    return { ok: false, json: s?.error ? { error: s.error } : {} };
+                };
 
                 const errors: string[] = [];
 
                 // Process Exam Status & Arrears
-                const examJson = await examRes.json().catch(() => ({}));
-                const arrearsJson = await arrearsRes.json().catch(() => ({}));
+                const { ok: examOk, json: examJson } = section('exam_status');
+                const { ok: arrearsOk, json: arrearsJson } = section('arrears');
 
-                if (arrearsRes.ok && arrearsJson.success) {
+                if (arrearsOk && arrearsJson.success) {
                     setArrearsData(arrearsJson.data || []);
                     setStats(prev => prev ? { ...prev, arrears: arrearsJson.count || 0 } : null);
-                } else if (examRes.ok && !examJson.error) {
+                } else if (examOk && !examJson.error) {
                     setStats(prev => prev ? { ...prev, arrears: examJson.arrears_current || 0 } : null);
                 }
 
-                const dailyJson = await dailyRes.json().catch(() => ({}));
-                if (dailyRes.ok && dailyJson.data) {
+                const { ok: dailyOk, json: dailyJson } = section('daily');
+                if (dailyOk && dailyJson.data) {
                     setAttendanceDaily(Array.isArray(dailyJson.data) ? dailyJson.data : []);
                 } else if (dailyJson.error) errors.push(dailyJson.error);
 
-                const leaveJson = await leaveRes.json().catch(() => ({}));
-                if (leaveRes.ok && leaveJson.data) {
+                const { ok: leaveOk, json: leaveJson } = section('leave');
+                if (leaveOk && leaveJson.data) {
                     setLeaveData(Array.isArray(leaveJson.data) ? leaveJson.data : []);
                 } else if (leaveJson.error) errors.push(leaveJson.error);
 
-                const courseJson = await courseRes.json().catch(() => ({}));
-                if (courseRes.ok && courseJson.data) {
+                const { ok: courseOk, json: courseJson } = section('course');
+                if (courseOk && courseJson.data) {
                     setAttendanceCourse(Array.isArray(courseJson.data) ? courseJson.data : []);
                 } else if (courseJson.error) errors.push(courseJson.error);
 
@@ -0,0 +1,64 @@
+"""
+Benchmark the per-request auth path: JWT decoding and studtblId normalization.
+
+"before" repeats what an authorized request used to do: jwt.decode in
+extract_user_id_from_token, again in _get_test_context, and a base64 decode
+of both ids. "after" goes through the claims cache in backend/security.py,
+where repeat lookups for a token are a dict hit.
+
+    python scripts/bench_auth_path.py [--requests 50000] [--tokens 100]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from security import decode_studtbl_id, token_claims
+
+
+def authorize_before(auth_header: str, requested_id: str) -> bool:
+    token = auth_header[7:]
+    user_id = jwt.decode(token, options={"verify_signature": False}).get("sub")
+    is_test = jwt.decode(token, options={"verify_signature": False}).get("is_test_user")
+    normalize = decode_studtbl_id.__wrapped__
+    return not is_test and normalize(user_id) == normalize(requested_id)
+
+
+def authorize_after(auth_header: str, requested_id: str) -> bool:
+    claims = token_claims(auth_header)
+    is_test = token_claims(auth_header).is_test_user
+    return not is_test and claims.normalized_user_id == decode_studtbl_id(requested_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--tokens", type=int, default=100, help="distinct students sending requests")
+    args = parser.parse_args()
+
+    exp = int(time.time()) + 3600
+    students = []
+    for i in range(args.tokens):
+        studtbl_id = base64.b64encode(str(100000 + i).encode()).decode()
+        token = jwt.encode({"sub": studtbl_id, "exp": exp, "name": "Student", "role": "student"},
+                           "not-the-erp-key-but-long-enough-for-hs256", algorithm="HS256")
+        students.append((f"Bearer {token}", studtbl_id))
+
+    print(f"{'path':<8} {'us/request':>11} {'requests/s':>12}")
+    for name, authorize in (("before", authorize_before), ("after", authorize_after)):
+        start = time.perf_counter()
+        for i in range(args.requests):
+            header, studtbl_id = students[i % len(students)]
+            assert authorize(header, studtbl_id)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<8} {elapsed / args.requests * 1e6:>11.2f} {args.requests / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark response compression: bytes on the wire and CPU per request.
+
+Compares identity against every encoding available here (gzip always, br/zstd
+when brotli/zstandard are installed), both compressing on every request and
+serving a cached compressed variant as the compression middleware does for
+repeat ETags.
+
+    python scripts/bench_compression.py [--requests 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from cache import TTLCache, make_etag
+from content_encoding import CODECS, compress
+
+
+def sample_payloads():
+    """Shapes of the JSON the dashboard fetches most: daily attendance, inbox, course details."""
+    rng = random.Random(7)
+    courses = ["Data Structures", "Operating Systems", "Computer Networks", "Compiler Design", "Machine Learning"]
+    daily = {"data": [
+        {"attendanceDate": f"2024-{m:02d}-{d:02d}T00:00:00", "hourNo": h, "courseName": rng.choice(courses),
+         "attendanceStatus": rng.choice(["P", "P", "P", "A", "OD"]), "facultyName": "Dr. K. Raman"}
+        for m in range(1, 6) for d in range(1, 29) for h in range(1, 8)
+    ]}
+    inbox = {"data": [
+        {"messageGuid": f"{rng.getrandbits(128):032x}", "subject": f"Circular {i}: examination schedule update",
+         "senderName": "Controller of Examinations", "receivedOn": f"2024-03-{i % 28 + 1:02d}T10:15:00", "isRead": i % 3 == 0}
+        for i in range(150)
+    ]}
+    course = {"data": [
+        {"courseCode": f"CS{3000 + i}", "courseName": courses[i % len(courses)], "present": rng.randint(30, 60),
+         "absent": rng.randint(0, 10), "onDuty": rng.randint(0, 4), "percentage": round(rng.uniform(65, 100), 2)}
+        for i in range(12)
+    ]}
+    return {"daily_attendance": daily, "inbox": inbox, "course_detail": course}
+
+
+def bench(body: bytes, encoding: str, requests: int, cached: bool):
+    variants = TTLCache()
+    etag = make_etag(body)
+    start = time.process_time()
+    for _ in range(requests):
+        if encoding == "identity":
+            out = body
+            continue
+        out = variants.get(f"{encoding}:{etag}") if cached else None
+        if out is None:
+            out = compress(body, encoding)
+            if cached:
+                variants.set(f"{encoding}:{etag}", out)
+    cpu = time.process_time() - start
+    return len(out), cpu / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    encodings = ["identity", *CODECS]
+    print(f"{'payload':<16} {'encoding':<9} {'bytes':>9} {'ratio':>7} {'us/req':>9} {'us/req cached':>14}")
+    for name, payload in sample_payloads().items():
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        for encoding in encodings:
+            size, per_request = bench(body, encoding, args.requests, cached=False)
+            _, per_hit = bench(body, encoding, args.requests, cached=True)
+            print(f"{name:<16} {encoding:<9} {size:>9} {size / len(body):>7.3f} {per_request:>9.1f} {per_hit:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
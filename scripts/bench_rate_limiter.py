@@ -0,0 +1,80 @@
+"""
+Microbenchmark for the rate limiter: per-call cost and memory as the number
+of distinct keys grows.
+
+Runs the sliding-window counter in backend/security.py next to the previous
+timestamp-list limiter, with calls spread over N distinct keys (one per
+client IP) and with a single hot key close to its limit.
+
+    python scripts/bench_rate_limiter.py [--calls 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from security import SlidingWindowRateLimiter
+
+
+class TimestampListLimiter:
+    """The limiter this replaced: a list of request times per key, never evicted."""
+
+    def __init__(self):
+        self.storage = {}
+
+    def hit(self, key, max_requests, window_seconds, now=None):
+        now = time.time() if now is None else now
+        times = [t for t in self.storage.get(key, []) if now - t < window_seconds]
+        self.storage[key] = times
+        if len(times) >= max_requests:
+            return False
+        times.append(now)
+        return True
+
+
+def run(limiter, keys, calls, max_requests=100):
+    rng = random.Random(1)
+    sequence = [keys[rng.randrange(len(keys))] for _ in range(calls)]
+    start = time.perf_counter()
+    for key in sequence:
+        limiter.hit(key, max_requests, 60)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def memory(make, keys):
+    tracemalloc.start()
+    limiter = make()
+    for key in keys:
+        limiter.hit(key, 100, 60)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    limiters = {"sliding-window": SlidingWindowRateLimiter, "timestamp-list": TimestampListLimiter}
+    print(f"{'limiter':<16} {'keys':>8} {'ns/call':>9} {'MiB':>7}")
+    for distinct in (1_000, 10_000, 100_000):
+        keys = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(distinct)]
+        for name, make in limiters.items():
+            per_call = run(make(), keys, args.calls)
+            print(f"{name:<16} {distinct:>8} {per_call:>9.0f} {memory(make, keys):>7.1f}")
+
+    # One client near its limit: the list limiter rescans ~max_requests entries per call
+    print(f"\n{'limiter':<16} {'limit':>8} {'ns/call':>9}   (single hot key)")
+    for max_requests in (100, 1_000, 10_000):
+        for name, make in limiters.items():
+            print(f"{name:<16} {max_requests:>8} {run(make(), ['hot'], max_requests * 2, max_requests):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
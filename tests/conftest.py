@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+# The backend is a flat package of modules run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# Keep the app's caches, counters and logs in memory / a scratch dir for tests
+_scratch = tempfile.mkdtemp(prefix="edumate-tests-")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("AUDIT_LOG_PATH", "")
+os.environ.setdefault("BLOB_CACHE_DIR", os.path.join(_scratch, "blobs"))
+os.environ.setdefault("PDF_CACHE_DIR", os.path.join(_scratch, "pdfs"))
+
+import main  # noqa: E402
+import security  # noqa: E402
+from cache import MemoryCounterBackend  # noqa: E402
+
+# Only the fake ERP knows this key, like the real one: the backend never verifies signatures
+ERP_SIGNING_KEY = "erp-signing-key-known-only-to-the-fake-upstream"
+
+
+def studtbl_id(raw: str) -> str:
+    return base64.b64encode(raw.encode()).decode()
+
+
+def bearer(studtbl: str, key: str = ERP_SIGNING_KEY) -> dict:
+    token = jwt.encode({"sub": studtbl, "exp": int(time.time()) + 3600}, key, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}", "X-Institution-Id": "SEC"}
+
+
+class FakeERP:
+    """Upstream stand-in: rejects tokens it did not sign, answers with the requested student's data."""
+
+    def __init__(self):
+        self.calls = []
+        self.routes = {}  # path fragment -> handler(request, claims), checked first
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/User/Login"):
+            body = json.loads(request.content)
+            sid = studtbl_id(body["userName"])
+            return httpx.Response(200, json={"idToken": bearer(sid)["Authorization"][7:], "userId": sid})
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.decode(token, ERP_SIGNING_KEY, algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            return httpx.Response(401, json={"message": "Unauthorized"})
+        self.calls.append((request.url.path, claims["sub"]))
+        student = request.url.params.get("studtblId", claims["sub"])
+        path = request.url.path
+        for fragment, handler in self.routes.items():
+            if fragment in path:
+                return handler(request, claims)
+        if "PersonalDetails" in path:
+            return httpx.Response(200, json={"data": {"studentName": f"Student {student}", "mobileNo": "98400 00000"}})
+        if "ParentDetails" in path:
+            return httpx.Response(200, json={"data": {"fatherName": f"Parent of {student}"}})
+        if "DownloadBlob" in path:
+            body = f"%PDF-1.4 document {request.url.params.get('documentId')} of {student}".encode()
+            return httpx.Response(200, content=body, headers={"content-type": "application/pdf"})
+        if "GetMessageDetails" in path:
+            return httpx.Response(200, json={"data": {"messageGuid": request.url.params.get("MessageGuid"), "body": f"For {student}"}})
+        if "Dashboard" in path:
+            return httpx.Response(200, json={"data": [{"attendancePercentage": 88, "uG_Cgpa": 8.1}]})
+        return httpx.Response(200, json={"success": True, "data": []})
+
+
+_upstream = [None]
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    # One app and event loop for the session: module-level asyncio primitives bind to the first loop
+    with TestClient(main.app) as test_client:
+        real_client = main.app.state.client
+        main.app.state.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: _upstream[0](request)))
+        yield test_client
+        main.app.state.client = real_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits(monkeypatch):
+    # Every test starts with empty budgets; the app shares one client IP across tests
+    monkeypatch.setattr(security, "rate_limiter", security.SlidingWindowRateLimiter(backend=MemoryCounterBackend()))
+
+
+@pytest.fixture
+def erp():
+    _upstream[0] = FakeERP()
+    return _upstream[0]
+
+
+@pytest.fixture
+def client(app_client, erp):
+    return app_client
@@ -0,0 +1,40 @@
+"""POST /api/batch runs each sub-request's own ownership check and only batches JSON routes."""
+
+from conftest import bearer, studtbl_id
+
+
+def batch(client, headers, *requests):
+    response = client.post("/api/batch", json={"requests": list(requests)}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+def test_sub_request_for_another_student_is_forbidden(client, erp):
+    owner, other = studtbl_id("BATCH-OWNER"), studtbl_id("BATCH-OTHER")
+
+    results = batch(client, bearer(owner),
+                    {"path": "/api/student/personal", "query": {"studtblId": owner}},
+                    {"path": "/api/student/personal", "query": {"studtblId": other}})
+
+    assert results[0]["status"] == 200
+    assert results[0]["body"]["name"] == f"Student {owner}"
+    assert results[1]["status"] == 403
+    assert "name" not in results[1]["body"]
+    assert [sub for _, sub in erp.calls] == [owner]
+
+
+def test_batch_requires_a_token(client, erp):
+    response = client.post("/api/batch", json={"requests": []}, headers={"X-Institution-Id": "SEC"})
+
+    assert response.status_code == 401
+
+
+def test_file_and_stream_routes_are_rejected_before_dispatch(client, erp):
+    sid = studtbl_id("BATCH-FILES")
+
+    results = batch(client, bearer(sid),
+                    {"path": "/api/document/download-blob", "query": {"studtblId": sid, "documentId": "QUJD"}},
+                    {"path": "/api/attendance/bundle", "query": {"studtblId": sid, "stream": "ndjson"}})
+
+    assert [result["status"] for result in results] == [400, 400]
+    assert erp.calls == []
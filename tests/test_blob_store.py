@@ -0,0 +1,85 @@
+"""BlobStore shared by several workers: each process has its own BlobStore over one root."""
+
+import os
+
+from blob_store import BlobStore
+
+
+def test_blob_stored_by_another_worker_is_a_hit(tmp_path):
+    writer, reader = BlobStore(str(tmp_path)), BlobStore(str(tmp_path))
+    meta = writer.put("doc", b"report", "application/pdf")
+
+    found = reader.lookup("doc")
+
+    assert found is not None
+    path, found_meta = found
+    assert found_meta == meta
+    with open(path, "rb") as f:
+        assert f.read() == b"report"
+    # The ref must survive the other worker's lookup
+    assert writer.lookup("doc") is not None
+
+
+def test_blob_evicted_by_another_worker_is_a_miss(tmp_path):
+    first, second = BlobStore(str(tmp_path)), BlobStore(str(tmp_path))
+    meta = first.put("doc", b"report", "application/pdf")
+    os.remove(first.object_path(meta.sha256))
+
+    assert second.lookup("doc") is None
+    assert first.lookup("doc") is None
+
+
+def test_size_limit_covers_every_worker(tmp_path):
+    # rescan_interval=0: every store rescans the shared directory
+    first = BlobStore(str(tmp_path), max_bytes=100, rescan_interval=0)
+    second = BlobStore(str(tmp_path), max_bytes=100, rescan_interval=0)
+    first.put("a", b"a" * 60, "text/plain")
+    second.put("b", b"b" * 60, "text/plain")
+
+    sizes = [os.path.getsize(os.path.join(tmp_path, "objects", name))
+             for name in os.listdir(os.path.join(tmp_path, "objects"))]
+    assert sum(sizes) <= 100
+    assert second.lookup("b") is not None
+    assert first.lookup("a") is None
+
+
+def test_expired_blob_is_a_miss(tmp_path):
+    store = BlobStore(str(tmp_path))
+    store.put("doc", b"report", "application/pdf", ttl=-1)
+
+    assert store.lookup("doc") is None
+
+
+def test_oversized_put_leaves_existing_objects_alone(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=100)
+    store.put("small", b"s" * 40, "text/plain")
+
+    assert store.put("huge", b"h" * 101, "text/plain") is None
+
+    assert store.lookup("small") is not None
+    assert store.lookup("huge") is None
+    assert os.listdir(os.path.join(tmp_path, "objects")) == [store.lookup("small")[1].sha256]
+    assert store.stats()["evictions"] == 0
+
+
+def test_stale_refs_are_pruned(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=100, prune_interval=3600)
+    store.put("expired", b"e" * 10, "text/plain", ttl=-1)
+    store.put("evicted", b"v" * 60, "text/plain")
+    store.put("kept", b"k" * 60, "text/plain")  # evicts "evicted"'s object
+    refs_dir = os.path.join(tmp_path, "refs")
+    assert len(os.listdir(refs_dir)) == 3
+
+    # Nobody looks those keys up again; the periodic pass removes their refs
+    assert store.prune_refs() == 2
+
+    assert len(os.listdir(refs_dir)) == 1
+    assert store.lookup("kept") is not None
+
+
+def test_refs_are_pruned_while_storing(tmp_path):
+    store = BlobStore(str(tmp_path), prune_interval=0)
+    for i in range(20):
+        store.put(f"report:{i}", f"pdf {i}".encode(), "application/pdf", ttl=-1)
+
+    assert len(os.listdir(os.path.join(tmp_path, "refs"))) <= 1
@@ -0,0 +1,111 @@
+"""Cached student data must only reach tokens the upstream ERP has accepted."""
+
+from conftest import bearer, studtbl_id
+
+# Any key but the ERP's: the backend cannot tell the difference, only upstream can
+FORGED_KEY = "a-key-the-erp-never-signed-anything-with"
+
+
+def test_cache_hit_is_served_to_the_owner(client, erp):
+    sid = studtbl_id("OWNER-HIT")
+    headers = bearer(sid)
+    first = client.get("/api/student/personal", params={"studtblId": sid}, headers=headers)
+    second = client.get("/api/student/personal", params={"studtblId": sid}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert first.json()["name"] == f"Student {sid}"
+    assert len(erp.calls) == 1
+
+
+def test_forged_token_does_not_get_cached_data(client, erp):
+    sid = studtbl_id("VICTIM")
+    victim = client.get("/api/student/personal", params={"studtblId": sid}, headers=bearer(sid))
+    assert victim.json()["name"] == f"Student {sid}"
+
+    # Same sub claim, signed with a key the ERP doesn't know
+    forged = client.get("/api/student/personal", params={"studtblId": sid}, headers=bearer(sid, key=FORGED_KEY))
+
+    assert "name" not in forged.json()
+    assert forged.json() == {"error": "Failed to fetch personal details"}
+    assert len(erp.calls) == 1
+
+
+def test_forged_token_does_not_get_cached_parent_details(client, erp):
+    sid = studtbl_id("VICTIM-PARENT")
+    client.get("/api/student/parent", params={"studtblId": sid}, headers=bearer(sid))
+
+    forged = client.get("/api/student/parent", params={"studtblId": sid}, headers=bearer(sid, key=FORGED_KEY))
+
+    assert "error" in forged.json()
+    assert f"Parent of {sid}" not in forged.text
+
+
+def test_other_students_id_is_forbidden(client, erp):
+    owner, other = studtbl_id("OWNER"), studtbl_id("OTHER")
+    client.get("/api/student/personal", params={"studtblId": other}, headers=bearer(other))
+
+    response = client.get("/api/student/personal", params={"studtblId": other}, headers=bearer(owner))
+
+    assert response.status_code == 403
+    assert len(erp.calls) == 1
+
+
+def test_forged_token_does_not_get_stale_dashboard_stats(client, erp):
+    sid = studtbl_id("VICTIM-STATS")
+    victim = client.get("/api/dashboard/stats", params={"studtblId": sid}, headers=bearer(sid))
+    assert victim.json()["cgpa"] == 8.1
+
+    # Upstream fails for the forged token, so the stale-if-error copy must not be used either
+    forged = client.get("/api/dashboard/stats", params={"studtblId": sid}, headers=bearer(sid, key=FORGED_KEY))
+
+    assert forged.json() == {"error": "Failed to fetch dashboard data"}
+    assert len(erp.calls) == 1
+
+
+def test_forged_token_does_not_get_stored_document(client, erp):
+    sid = studtbl_id("VICTIM-DOC")
+    params = {"studtblId": sid, "documentId": studtbl_id("DOC-1")}
+    victim = client.get("/api/document/download-blob", params=params, headers=bearer(sid))
+    assert victim.content.startswith(b"%PDF-1.4 document")
+
+    forged = client.get("/api/document/download-blob", params=params, headers=bearer(sid, key=FORGED_KEY))
+
+    assert b"%PDF" not in forged.content
+    assert len(erp.calls) == 1
+
+
+def test_forged_token_does_not_get_cached_message(client, erp):
+    sid = studtbl_id("VICTIM-INBOX")
+    params = {"categoryGuid": "c1", "messageGuid": "m1", "receiver": sid}
+    victim = client.get("/api/inbox/message-details", params=params, headers=bearer(sid))
+    assert victim.json()["data"]["body"] == f"For {sid}"
+
+    forged = client.get("/api/inbox/message-details", params=params, headers=bearer(sid, key=FORGED_KEY))
+
+    assert forged.json() == {"error": "Failed to fetch message details"}
+    assert len(erp.calls) == 1
+
+
+def test_per_student_responses_are_not_shared_cacheable(client, erp):
+    sid = studtbl_id("PRIVATE-DOC")
+    headers = bearer(sid)
+    params = {"studtblId": sid, "documentId": studtbl_id("DOC-2")}
+
+    fresh = client.get("/api/document/download-blob", params=params, headers=headers)
+    stored = client.get("/api/document/download-blob", params=params, headers=headers)
+
+    for response in (fresh, stored):
+        assert response.headers["cache-control"].startswith("private,")
+
+
+def test_forged_token_gets_no_cached_bootstrap_sections(client, erp):
+    sid = studtbl_id("VICTIM-BOOT")
+    victim = client.get("/api/dashboard/bootstrap", params={"studtblId": sid}, headers=bearer(sid))
+    assert victim.json()["personal"]["status"] == "ok"
+    calls = len(erp.calls)
+
+    forged = client.get("/api/dashboard/bootstrap", params={"studtblId": sid}, headers=bearer(sid, key=FORGED_KEY))
+
+    assert all(section["status"] == "error" for section in forged.json().values())
+    assert len(erp.calls) == calls
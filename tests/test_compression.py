@@ -0,0 +1,59 @@
+"""A 304 revalidating a compressed response carries the same validator and Vary as its 200."""
+
+import httpx
+
+from conftest import bearer, studtbl_id
+
+
+def leave_records(request, claims):
+    records = [{"leaveDate": f"2024-03-{i % 28 + 1:02d}", "status": "Approved", "reason": "Medical leave"}
+               for i in range(200)]
+    return httpx.Response(200, json={"data": records})
+
+
+def revalidate(client, path, params, headers):
+    first = client.get(path, params=params, headers=headers)
+    second = client.get(path, params=params, headers={**headers, "If-None-Match": first.headers["etag"]})
+    return first, second
+
+
+def test_gzip_200_then_conditional_304(client, erp):
+    erp.routes["GetLeaveStatusByStudent"] = leave_records
+    sid = studtbl_id("GZIP-304")
+    headers = {**bearer(sid), "Accept-Encoding": "gzip"}
+
+    first, second = revalidate(client, "/api/attendance/leave-status", {"studtblId": sid}, headers)
+
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["etag"].startswith('W/"')
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["vary"] == first.headers["vary"]
+    assert "Accept-Encoding" in second.headers["vary"]
+    assert "content-type" not in second.headers
+
+
+def test_small_body_304_matches_its_200(client, erp):
+    # Too small to compress, and served from the response cache on revalidation
+    sid = studtbl_id("SMALL-304")
+    headers = {**bearer(sid), "Accept-Encoding": "gzip"}
+
+    first, second = revalidate(client, "/api/student/personal", {"studtblId": sid}, headers)
+
+    assert "content-encoding" not in first.headers
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["vary"] == first.headers["vary"]
+
+
+def test_identity_304_keeps_the_strong_validator(client, erp):
+    erp.routes["GetLeaveStatusByStudent"] = leave_records
+    sid = studtbl_id("IDENTITY-304")
+    headers = {**bearer(sid), "Accept-Encoding": "identity"}
+
+    first, second = revalidate(client, "/api/attendance/leave-status", {"studtblId": sid}, headers)
+
+    assert first.headers["etag"].startswith('"')
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
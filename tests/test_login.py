@@ -0,0 +1,34 @@
+"""Login seeds the personal details cache for the dashboard's first request."""
+
+import main
+
+
+def login(client, username):
+    response = client.post("/api/login", json={"username": username, "password": "secret"},
+                           headers={"X-Institution-Id": "SEC"})
+    assert response.status_code == 200
+    body = response.json()
+    return body["studtblId"], {"Authorization": f"Bearer {body['token']}", "X-Institution-Id": "SEC"}
+
+
+def test_login_seeds_personal_details(client, erp):
+    sid, headers = login(client, "SEEDED")
+    calls = len(erp.calls)
+
+    personal = client.get("/api/student/personal", params={"studtblId": sid}, headers=headers)
+
+    assert personal.json()["name"] == f"Student {sid}"
+    assert len(erp.calls) == calls
+
+
+def test_login_does_not_seed_an_error_result(client, erp, monkeypatch):
+    normalize = main._normalize_personal
+    monkeypatch.setattr(main, "_normalize_personal", lambda json_data: {"error": "Invalid data format"})
+    sid, headers = login(client, "MALFORMED")
+    calls = len(erp.calls)
+
+    monkeypatch.setattr(main, "_normalize_personal", normalize)
+    personal = client.get("/api/student/personal", params={"studtblId": sid}, headers=headers)
+
+    assert personal.json()["name"] == f"Student {sid}"
+    assert len(erp.calls) == calls + 1
@@ -0,0 +1,32 @@
+"""The per-user rate limit is keyed by bearer token, so a forged token can't spend a student's budget."""
+
+import main
+from conftest import bearer, studtbl_id
+
+# Any key but the ERP's
+FORGED_KEY = "a-key-the-erp-never-signed-anything-with"
+
+
+def test_forged_tokens_do_not_use_up_the_students_budget(client, erp, monkeypatch):
+    monkeypatch.setattr(main, "RATE_LIMIT_PER_IP", 10_000)
+    sid = studtbl_id("RATE-VICTIM")
+    victim, attacker = bearer(sid), bearer(sid, key=FORGED_KEY)
+
+    # 100 requests with the victim's sub, signed by someone else
+    for _ in range(100):
+        client.get("/api/student/personal", params={"studtblId": sid}, headers=attacker)
+    forged = client.get("/api/student/personal", params={"studtblId": sid}, headers=attacker)
+
+    assert forged.status_code == 429
+    assert client.get("/api/student/personal", params={"studtblId": sid}, headers=victim).status_code == 200
+
+
+def test_tokens_from_one_ip_share_the_ip_cap(client, erp, monkeypatch):
+    monkeypatch.setattr(main, "RATE_LIMIT_PER_IP", 3)
+    statuses = [
+        client.get("/api/student/personal", params={"studtblId": sid}, headers=bearer(sid)).status_code
+        for sid in (studtbl_id(f"RATE-NAT-{i}") for i in range(5))
+    ]
+
+    assert statuses[:3] == [200, 200, 200]
+    assert statuses[3:] == [429, 429]
@@ -0,0 +1,125 @@
+"""SlidingWindowRateLimiter: limits, window rollover and leases from a shared counter backend."""
+
+import time
+
+import pytest
+
+from cache import CounterBackend, MemoryCounterBackend, SQLiteCounterBackend
+from security import SlidingWindowRateLimiter
+
+WINDOW = 60
+# Start of the next window, so a whole window fits before rollover
+T0 = (int(time.time() // WINDOW) + 1) * WINDOW
+
+
+def allowed(limiter, key, max_requests, n, now):
+    return sum(bool(limiter.hit(key, max_requests, WINDOW, now=now)) for _ in range(n))
+
+
+def test_limit_boundary():
+    limiter = SlidingWindowRateLimiter()
+
+    assert [limiter.hit("a", 5, WINDOW, now=T0 + 1) for _ in range(6)] == [True] * 5 + [False]
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_keys_are_limited_separately():
+    limiter = SlidingWindowRateLimiter()
+
+    assert allowed(limiter, "a", 3, 5, T0) == 3
+    assert allowed(limiter, "b", 3, 5, T0) == 3
+
+
+def test_previous_window_is_weighted_by_its_overlap():
+    limiter = SlidingWindowRateLimiter()
+    assert allowed(limiter, "a", 10, 10, T0 + 59) == 10
+
+    # Half-way into the next window, half of the previous 10 still count
+    assert allowed(limiter, "a", 10, 10, T0 + WINDOW + WINDOW / 2) == 5
+
+
+def test_window_rollover_forgets_older_windows():
+    limiter = SlidingWindowRateLimiter()
+    assert allowed(limiter, "a", 10, 10, T0) == 10
+
+    # Two windows later nothing from the first one overlaps
+    assert allowed(limiter, "a", 10, 20, T0 + 2 * WINDOW) == 10
+
+
+def test_rejected_requests_are_not_counted():
+    limiter = SlidingWindowRateLimiter()
+    assert allowed(limiter, "a", 4, 50, T0) == 4
+
+    assert allowed(limiter, "a", 4, 4, T0 + WINDOW) == 0
+    assert allowed(limiter, "a", 4, 4, T0 + 2 * WINDOW) == 4
+
+
+def test_tracked_keys_are_bounded():
+    limiter = SlidingWindowRateLimiter(max_keys=100, idle_ttl=1)
+
+    for i in range(1000):
+        limiter.hit(f"ip:{i}", 5, WINDOW, now=T0 + i / 100)
+
+    assert limiter.stats()["keys"] <= 100
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCounterBackend()
+    return SQLiteCounterBackend(str(tmp_path / "counters.sqlite3"))
+
+
+def test_workers_sharing_a_backend_admit_the_limit_in_total(backend):
+    workers = [SlidingWindowRateLimiter(backend=backend, lease_size=5) for _ in range(3)]
+
+    admitted = sum(allowed(worker, "user", 12, 1, T0) for _ in range(10) for worker in workers)
+
+    assert admitted == 12
+    # Leases granted beyond the limit were handed back
+    assert backend.get(f"user:{int(T0 // WINDOW)}") == 12
+
+
+def test_partial_lease_is_reconciled(backend):
+    first = SlidingWindowRateLimiter(backend=backend, lease_size=5)
+    second = SlidingWindowRateLimiter(backend=backend, lease_size=5)
+    window_key = f"user:{int(T0 // WINDOW)}"
+
+    assert allowed(first, "user", 7, 5, T0) == 5
+    # Only 2 of a 5-request lease fit under the limit
+    assert allowed(second, "user", 7, 5, T0) == 2
+    assert backend.get(window_key) == 7
+    assert first.hit("user", 7, WINDOW, now=T0) is False
+
+
+def test_shared_previous_window_counts_after_rollover(backend):
+    first = SlidingWindowRateLimiter(backend=backend, lease_size=5)
+    second = SlidingWindowRateLimiter(backend=backend, lease_size=5)
+    assert allowed(first, "user", 10, 10, T0 + 59) == 10
+
+    # The other worker never saw the first window but still weighs it in
+    assert allowed(second, "user", 10, 10, T0 + WINDOW + WINDOW / 2) == 5
+
+
+def test_local_only_defers_to_a_lease():
+    limiter = SlidingWindowRateLimiter(backend=MemoryCounterBackend(), lease_size=5)
+
+    assert limiter.hit("user", 10, WINDOW, now=T0, local_only=True) is None
+    assert limiter.hit("user", 10, WINDOW, now=T0) is True
+    # The rest of the lease is spent without the backend
+    assert [limiter.hit("user", 10, WINDOW, now=T0, local_only=True) for _ in range(4)] == [True] * 4
+    assert limiter.hit("user", 10, WINDOW, now=T0, local_only=True) is None
+
+
+def test_unreachable_backend_fails_open():
+    class Unreachable(CounterBackend):
+        def incr(self, key, amount, ttl):
+            raise ConnectionError("down")
+
+        def get(self, key):
+            raise ConnectionError("down")
+
+    limiter = SlidingWindowRateLimiter(backend=Unreachable())
+
+    assert limiter.hit("user", 1, WINDOW, now=T0) is True
+    assert limiter.stats()["backend_errors"] == 1
@@ -0,0 +1,81 @@
+"""ReferenceCache only refreshes keys upstream answered, with the latest reader's credentials."""
+
+import asyncio
+import time
+
+from cache import ReferenceCache
+
+
+def fetcher(body, calls, name):
+    async def fetch():
+        calls.append(name)
+        return body
+    return fetch
+
+
+def test_failed_fetch_is_not_refreshed():
+    cache, calls = ReferenceCache(), []
+
+    assert asyncio.run(cache.get("SEC:notes:random", fetcher(None, calls, "anonymous"))) is None
+    asyncio.run(cache.refresh_all())
+
+    assert calls == ["anonymous"]
+    assert cache.stats()["entries"] == 0
+
+
+def test_refresh_uses_most_recent_reader():
+    cache, calls = ReferenceCache(), []
+
+    async def scenario():
+        await cache.get("SEC:menu", fetcher(b"{}", calls, "first"))
+        await cache.get("SEC:menu", fetcher(b"{}", calls, "second"))
+        await cache.refresh_all()
+
+    asyncio.run(scenario())
+
+    assert calls == ["first", "second"]
+
+
+def test_expired_credentials_are_not_replayed():
+    cache, calls = ReferenceCache(), []
+
+    async def scenario():
+        await cache.get("SEC:menu", fetcher(b"{}", calls, "user"), expires_at=time.time() + 60)
+        cache._sources["SEC:menu"] = cache._sources["SEC:menu"]._replace(expires_at=time.time() - 1)
+        await cache.refresh_all()
+
+    asyncio.run(scenario())
+
+    assert calls == ["user"]
+    assert cache.stats()["entries"] == 0
+
+
+def test_failed_refresh_stops_refreshing_but_keeps_serving():
+    cache, calls = ReferenceCache(), []
+    bodies = [b'{"v":1}', None]
+
+    async def fetch():
+        calls.append("user")
+        return bodies.pop(0)
+
+    async def scenario():
+        await cache.get("SEC:menu", fetch)
+        await cache.refresh_all()
+        await cache.refresh_all()
+        return await cache.get("SEC:menu", fetcher(b"unused", calls, "reader"))
+
+    assert asyncio.run(scenario()) == b'{"v":1}'
+    assert calls == ["user", "user"]
+
+
+def test_key_count_is_capped():
+    cache, calls = ReferenceCache(max_keys=3), []
+
+    async def scenario():
+        for i in range(10):
+            await cache.get(f"SEC:notes:{i}", fetcher(b"{}", calls, i))
+
+    asyncio.run(scenario())
+
+    assert cache.stats()["entries"] == 3
+    assert list(cache._sources) == ["SEC:notes:7", "SEC:notes:8", "SEC:notes:9"]